@@ -1,11 +1,21 @@
 import csv
 import datetime
+import functools
+import hashlib
+import io
+import itertools
+import json
+import math
 import os
 import pathlib
 import re
+import urllib.parse
 import multiprocessing
-from statistics import mean
+import operator
 import concurrent.futures
+from collections import deque
+import numpy as np
+import instrumentation
 
 def csv_reader(file_name):
     years_chunks = {}
@@ -28,31 +38,62 @@ def csv_writer(headers, years_chunks):
             writer.writerow(headers)
             writer.writerows(years_chunks[year])
 
+CURRENCY_TO_RUB = {
+    "AZN": 35.68,
+    "BYR": 23.91,
+    "EUR": 59.90,
+    "GEL": 21.74,
+    "KGS": 0.76,
+    "KZT": 0.13,
+    "RUR": 1,
+    "UAH": 1.64,
+    "USD": 60.66,
+    "UZS": 0.0055,
+}
+CURRENCY_RATES = list(CURRENCY_TO_RUB.values())
+
+
+class Vocabulary:
+    __slots__ = ("values", "codes")
+
+    def __init__(self, values=()):
+        self.values = list(values)
+        self.codes = {value: code for code, value in enumerate(self.values)}
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getstate__(self):
+        return self.values
+
+    def __setstate__(self, values):
+        self.__init__(values)
+
+    def encode(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
 class Vacancy():
-    def __init__(self):
-        self.name = str()
-        self.salary_from = str()
-        self.salary_to = str()
-        self.salary_currency = str()
-        self.area_name = str()
-        self.published_at = str()
+    __slots__ = ("name", "salary_from", "salary_to", "salary_currency", "area_name", "published_at", "year",
+                 "ru_salary")
+    fields = ("name", "salary_from", "salary_to", "salary_currency", "area_name", "published_at")
 
-    def get_ru_salary(self):
-        self.currency_to_rub = {
-        "AZN": 35.68,
-        "BYR": 23.91,
-        "EUR": 59.90,
-        "GEL": 21.74,
-        "KGS": 0.76,
-        "KZT": 0.13,
-        "RUR": 1,
-        "UAH": 1.64,
-        "USD": 60.66,
-        "UZS": 0.0055,
-        }
-        return (int(float(self.salary_from)) + int(float(self.salary_to))) / 2 * self.currency_to_rub[
-                    self.salary_currency]
+    def __init__(self, name, salary_from, salary_to, salary_currency, area_name, published_at):
+        self.name = name
+        self.salary_from = int(float(salary_from))
+        self.salary_to = int(float(salary_to))
+        self.salary_currency = salary_currency
+        self.area_name = area_name
+        self.published_at = published_at
+        self.year = int(published_at[:4])
+        self.ru_salary = (self.salary_from + self.salary_to) / 2 * CURRENCY_RATES[salary_currency]
 
+    def get_ru_salary(self):
+        return self.ru_salary
 
 
 class DataSet():
@@ -61,24 +102,103 @@ class DataSet():
         self.vacancies_objects = []
 
     @staticmethod
-    def csv_reader(file_name):
+    def make_vocabularies():
+        return {"name": Vocabulary(), "salary_currency": Vocabulary(CURRENCY_TO_RUB.keys()), "area_name": Vocabulary()}
+
+    @staticmethod
+    def csv_reader(file_name, vocabularies=None):
         empty = False
         vacancies = []
         first_line = []
+        if vocabularies is None:
+            vocabularies = DataSet.make_vocabularies()
         with open(file_name, "r", encoding='utf_8_sig') as csv_file:
             reader = csv.reader(csv_file)
             for index, row in enumerate(reader):
                 if index == 0:
                     first_line = row
                     quanity = len(first_line)
+                    encoders = [vocabularies[skill].encode if skill in vocabularies else None for skill in first_line]
                 else:
                     if DataSet.check_list(row, quanity):
                         vacancie_dict = {}
                         for i, skill in enumerate(first_line):
-                            vacancie_dict[skill] = row[i]
+                            vacancie_dict[skill] = row[i] if encoders[i] is None else encoders[i](row[i])
                         vacancies.append(vacancie_dict)
 
-        return vacancies
+        return vocabularies, vacancies
+
+    @staticmethod
+    def iter_vacancies(file_name, vocabularies):
+        with open(file_name, "r", encoding='utf_8_sig') as csv_file:
+            reader = csv.reader(csv_file)
+            first_line = next(reader, [])
+            quanity = len(first_line)
+            get_fields = operator.itemgetter(*map(first_line.index, Vacancy.fields))
+            encode_name = vocabularies["name"].encode
+            encode_currency = vocabularies["salary_currency"].encode
+            encode_area = vocabularies["area_name"].encode
+            for row in reader:
+                if DataSet.check_list(row, quanity):
+                    name, salary_from, salary_to, salary_currency, area_name, published_at = get_fields(row)
+                    yield Vacancy(encode_name(name), salary_from, salary_to, encode_currency(salary_currency),
+                                  encode_area(area_name), published_at)
+
+    @staticmethod
+    def split_byte_ranges(file_name, parts, block_size=1 << 20):
+        size = os.path.getsize(file_name)
+        with open(file_name, "rb") as csv_file:
+            first_line = csv_file.readline()
+            start = csv_file.tell()
+            targets = [start + (size - start) * i // parts for i in range(1, parts)]
+            boundaries = [start]
+            position = start
+            in_quotes = False
+            block = csv_file.read(block_size)
+            while block and targets:
+                offset = 0
+                while targets:
+                    target = targets[0] - position
+                    if target >= len(block):
+                        break
+                    if target > offset:
+                        in_quotes ^= block.count(b'"', offset, target) % 2 == 1
+                        offset = target
+                    newline = block.find(b"\n", offset)
+                    if newline == -1:
+                        break
+                    in_quotes ^= block.count(b'"', offset, newline) % 2 == 1
+                    offset = newline + 1
+                    if not in_quotes:
+                        boundaries.append(position + offset)
+                        while targets and targets[0] <= position + offset:
+                            targets.pop(0)
+                in_quotes ^= block.count(b'"', offset) % 2 == 1
+                position += len(block)
+                block = csv_file.read(block_size)
+        if boundaries[-1] < size:
+            boundaries.append(size)
+        header = next(csv.reader([first_line.decode('utf_8_sig')]))
+        return header, list(zip(boundaries, boundaries[1:]))
+
+    @staticmethod
+    def read_byte_range(file_name, start, end):
+        with open(file_name, "rb") as csv_file:
+            csv_file.seek(start)
+            text = csv_file.read(end - start).decode('utf_8')
+        return csv.reader(io.StringIO(text, newline=''))
+
+    def aggregate(self, profession_name, chunk_size=64 << 20, rates_file=None):
+        parts = max(os.cpu_count() or 1, os.path.getsize(self.file_name) // chunk_size)
+        header, ranges = DataSet.split_byte_ranges(self.file_name, parts)
+        aggregate = VacanciesAggregate(profession_name)
+        with concurrent.futures.ProcessPoolExecutor() as pool:
+            for instance in instrumentation.map_timed(
+                    pool, aggregate_byte_range,
+                    tuple(map(lambda x: (self.file_name, header, x, profession_name, rates_file), ranges)),
+                    labels=[f"{start}-{end}" for start, end in ranges], rows=operator.attrgetter("vacancies_count")):
+                aggregate.merge(instance)
+        return aggregate
 
     @staticmethod
     def check_list(non_checked_list, quanity):
@@ -101,13 +221,713 @@ class DataSet():
 
     @staticmethod
     def set_class_values(data):
-        vacancies = []
-        for dic in data:
-            vacancy = Vacancy()
-            for value in dic.items():
-                setattr(vacancy, value[0], value[1])
-            vacancies.append(vacancy)
-        return vacancies
+        get_fields = operator.itemgetter(*Vacancy.fields)
+        return [Vacancy(*get_fields(dic)) for dic in data]
+
+
+class ProfessionMatcher:
+    def __init__(self, profession_names):
+        self.profession_names = list(profession_names)
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [set()]
+        for index, profession_name in enumerate(self.profession_names):
+            state = 0
+            for char in profession_name:
+                if char not in self.goto[state]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append(set())
+                    self.goto[state][char] = len(self.goto) - 1
+                state = self.goto[state][char]
+            self.output[state].add(index)
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fail = self.fail[state]
+                while fail and char not in self.goto[fail]:
+                    fail = self.fail[fail]
+                fail = self.goto[fail].get(char, 0)
+                self.fail[next_state] = fail if fail != next_state else 0
+                self.output[next_state] |= self.output[self.fail[next_state]]
+
+    def match(self, text):
+        goto, fail, output = self.goto, self.fail, self.output
+        found = set(output[0])
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                found |= output[state]
+        return found
+
+
+class CurrencyRates:
+    currencies = list(CURRENCY_TO_RUB.keys())
+
+    def __init__(self, first_month, rates):
+        self.first_month = first_month
+        self.rates = rates
+
+    @classmethod
+    def static(cls):
+        return cls(0, np.array([[CURRENCY_TO_RUB[currency]] for currency in cls.currencies], dtype=np.float64))
+
+    @classmethod
+    def from_csv(cls, file_name):
+        # кэш курсов привязан ко времени изменения и размеру файла: отредактированный файл перечитывается,
+        # в том числе в процессах резидентного сервера
+        stat = os.stat(file_name)
+        return cls.read_csv(os.path.abspath(file_name), stat.st_mtime_ns, stat.st_size)
+
+    @classmethod
+    @functools.lru_cache(maxsize=16)
+    def read_csv(cls, file_name, mtime_ns, size):
+        with open(file_name, "r", encoding='utf_8_sig') as csv_file:
+            reader = csv.reader(csv_file)
+            first_line = next(reader)
+            rows = [(int(row[0][:4]) * 12 + int(row[0][5:7]) - 1, row[1:]) for row in reader if row]
+        first_month = min(month for month, values in rows)
+        rates = np.full((len(cls.currencies), max(month for month, values in rows) - first_month + 1), np.nan)
+        columns = {currency: index for index, currency in enumerate(first_line[1:])}
+        for month, values in rows:
+            for code, currency in enumerate(cls.currencies):
+                if currency in columns and values[columns[currency]] != '':
+                    rates[code, month - first_month] = float(values[columns[currency]])
+        for code, currency in enumerate(cls.currencies):
+            if currency == "RUR":
+                rates[code] = 1
+                continue
+            for month in range(1, rates.shape[1]):
+                if np.isnan(rates[code, month]):
+                    rates[code, month] = rates[code, month - 1]
+            rates[code, np.isnan(rates[code])] = CURRENCY_TO_RUB[currency]
+        return cls(first_month, rates)
+
+    def lookup(self, currency, month):
+        return self.rates[currency, np.clip(month - self.first_month, 0, self.rates.shape[1] - 1)]
+
+
+class NameIndex:
+    ngram_size = 3
+    arrays = ("rows", "offsets", "ngram_codes", "ngram_offsets")
+
+    def __init__(self, names, rows, offsets, ngrams, ngram_codes, ngram_offsets):
+        self.names = names
+        self.rows = rows
+        self.offsets = offsets
+        self.ngrams = ngrams
+        self.ngram_codes = ngram_codes
+        self.ngram_offsets = ngram_offsets
+        self.ngram_positions = {ngram: position for position, ngram in enumerate(ngrams)}
+
+    @classmethod
+    def get_ngrams(cls, text):
+        return {text[i:i + cls.ngram_size] for i in range(len(text) - cls.ngram_size + 1)}
+
+    @classmethod
+    def build(cls, names, name_column):
+        rows = np.argsort(name_column, kind='stable').astype(np.int64)
+        offsets = np.concatenate(([0], np.cumsum(np.bincount(name_column, minlength=len(names))))).astype(np.int64)
+        postings = {}
+        for code, name in enumerate(names):
+            for ngram in cls.get_ngrams(name):
+                postings.setdefault(ngram, []).append(code)
+        ngrams = sorted(postings.keys())
+        ngram_codes = np.array([code for ngram in ngrams for code in postings[ngram]], dtype=np.int32)
+        ngram_offsets = np.concatenate(([0], np.cumsum([len(postings[ngram]) for ngram in ngrams]))).astype(np.int64)
+        return cls(names, rows, offsets, ngrams, ngram_codes, ngram_offsets)
+
+    @classmethod
+    def load(cls, folder, names):
+        arrays = {name: np.load(os.path.join(folder, f"index_{name}.npy"), mmap_mode='r') for name in cls.arrays}
+        with open(os.path.join(folder, "index_ngrams.json"), "r", encoding='utf_8') as ngrams_file:
+            ngrams = json.load(ngrams_file)
+        return cls(names, ngrams=ngrams, **arrays)
+
+    def save(self, folder):
+        for name in self.arrays:
+            np.save(os.path.join(folder, f"index_{name}.npy"), getattr(self, name))
+        with open(os.path.join(folder, "index_ngrams.json"), "w", encoding='utf_8') as ngrams_file:
+            json.dump(self.ngrams, ngrams_file, ensure_ascii=False)
+
+    def name_codes(self, profession_name):
+        if len(profession_name) < self.ngram_size:
+            return [code for code, name in enumerate(self.names) if profession_name in name]
+        postings = []
+        for ngram in self.get_ngrams(profession_name):
+            position = self.ngram_positions.get(ngram)
+            if position is None:
+                return []
+            postings.append(self.ngram_codes[self.ngram_offsets[position]:self.ngram_offsets[position + 1]])
+        postings.sort(key=len)
+        candidates = postings[0]
+        for codes in postings[1:]:
+            candidates = np.intersect1d(candidates, codes, assume_unique=True)
+        return [code for code in candidates.tolist() if profession_name in self.names[code]]
+
+    def get_rows(self, profession_name):
+        codes = self.name_codes(profession_name)
+        if not codes:
+            return np.empty(0, dtype=np.int64)
+        return np.sort(np.concatenate([self.rows[self.offsets[code]:self.offsets[code + 1]] for code in codes]))
+
+
+class VacancyTable:
+    currencies = CurrencyRates.currencies
+    columns = ("salary_from", "salary_to", "currency", "area", "year", "month", "name", "salary")
+    cache_version = 5
+    chunk_size = 1 << 13
+
+    def __init__(self, salary_from, salary_to, currency, area, year, month, name, areas, names, salary=None,
+                 index=None, common=None):
+        self.salary_from = salary_from
+        self.salary_to = salary_to
+        self.currency = currency
+        self.area = area
+        self.year = year
+        self.month = month
+        self.name = name
+        self.areas = areas
+        self.names = names
+        self.salary = salary
+        self.index = index
+        self.common = common
+
+    def __len__(self):
+        return len(self.year)
+
+    @staticmethod
+    def file_hash(file_name, block_size=1 << 20):
+        content_hash = hashlib.blake2b(digest_size=16)
+        with open(file_name, "rb") as source:
+            for block in iter(lambda: source.read(block_size), b""):
+                content_hash.update(block)
+        return content_hash.hexdigest()
+
+    @classmethod
+    def load(cls, file_name, cache_folder=".vacancy_cache"):
+        file_name = os.path.abspath(file_name)
+        folder = os.path.join(cache_folder, hashlib.blake2b(file_name.encode(), digest_size=8).hexdigest())
+        meta_name = os.path.join(folder, "meta.json")
+        stat = os.stat(file_name)
+        meta = None
+        if os.path.exists(meta_name):
+            with open(meta_name, "r", encoding='utf_8') as meta_file:
+                meta = json.load(meta_file)
+            if meta["version"] != cls.cache_version or meta["path"] != file_name:
+                meta = None
+            elif meta["size"] != stat.st_size or meta["mtime"] != stat.st_mtime_ns:
+                if meta["size"] == stat.st_size and meta["hash"] == cls.file_hash(file_name):
+                    meta.update(mtime=stat.st_mtime_ns)
+                    cls.write_meta(meta_name, meta)
+                else:
+                    meta = None
+        if meta is None:
+            table = cls.from_csv(file_name)
+            table.save(folder, {"version": cls.cache_version, "path": file_name, "size": stat.st_size,
+                                "mtime": stat.st_mtime_ns, "hash": cls.file_hash(file_name)})
+            return table
+        arrays = {column: np.load(os.path.join(folder, f"{column}.npy"), mmap_mode='r') for column in cls.columns}
+        with open(os.path.join(folder, "vocabulary.json"), "r", encoding='utf_8') as vocabulary_file:
+            vocabulary = json.load(vocabulary_file)
+        with open(os.path.join(folder, "common.json"), "r", encoding='utf_8') as common_file:
+            common = VacanciesAggregate.from_dict(json.load(common_file))
+        return cls(areas=vocabulary["areas"], names=vocabulary["names"],
+                   index=NameIndex.load(folder, vocabulary["names"]), common=common, **arrays)
+
+    def save(self, folder, meta):
+        os.makedirs(folder, exist_ok=True)
+        meta_name = os.path.join(folder, "meta.json")
+        if os.path.exists(meta_name):
+            os.remove(meta_name)
+        self.get_ru_salary()
+        for column in self.columns:
+            np.save(os.path.join(folder, f"{column}.npy"), getattr(self, column))
+        with open(os.path.join(folder, "vocabulary.json"), "w", encoding='utf_8') as vocabulary_file:
+            json.dump({"areas": self.areas, "names": self.names}, vocabulary_file, ensure_ascii=False)
+        self.index = NameIndex.build(self.names, self.name)
+        self.index.save(folder)
+        with open(os.path.join(folder, "common.json"), "w", encoding='utf_8') as common_file:
+            json.dump(self.get_common().to_dict(), common_file, ensure_ascii=False)
+        self.write_meta(meta_name, meta)
+
+    @staticmethod
+    def write_meta(meta_name, meta):
+        with open(meta_name + ".tmp", "w", encoding='utf_8') as meta_file:
+            json.dump(meta, meta_file)
+        os.replace(meta_name + ".tmp", meta_name)
+
+    @classmethod
+    def from_csv(cls, file_name, workers=None, part_size=8 << 20):
+        # большой файл разбирается по байтовым диапазонам в пуле процессов; внутри процессов пулов (например,
+        # MultipleReader) файл читается последовательно, чтобы не запускать вложенные пулы
+        parts = min(workers or os.cpu_count() or 1, os.path.getsize(file_name) // part_size)
+        if parts <= 1 or multiprocessing.parent_process() is not None:
+            with open(file_name, "r", encoding='utf_8_sig') as csv_file:
+                reader = csv.reader(csv_file)
+                return cls.from_rows(next(reader, []), reader)
+        header, ranges = DataSet.split_byte_ranges(file_name, parts)
+        with concurrent.futures.ProcessPoolExecutor(workers) as pool:
+            tables = instrumentation.map_timed(pool, table_byte_range,
+                                               tuple(map(lambda x: (file_name, header, x), ranges)),
+                                               labels=[f"{start}-{end}" for start, end in ranges], rows=len)
+        return cls.concatenate(tables)
+
+    @classmethod
+    def concatenate(cls, tables):
+        area_codes = {}
+        name_codes = {}
+        columns = {column: [] for column in cls.columns if column != "salary"}
+        for table in tables:
+            for column in ("salary_from", "salary_to", "currency", "year", "month"):
+                columns[column].append(getattr(table, column))
+            areas = np.array([area_codes.setdefault(area, len(area_codes)) for area in table.areas], dtype=np.int32)
+            names = np.array([name_codes.setdefault(name, len(name_codes)) for name in table.names], dtype=np.int32)
+            columns["area"].append(areas[table.area] if len(table) else table.area)
+            columns["name"].append(names[table.name] if len(table) else table.name)
+        return cls(**{column: np.concatenate(arrays) for column, arrays in columns.items()},
+                   areas=list(area_codes.keys()), names=list(name_codes.keys()))
+
+    @classmethod
+    def from_rows(cls, first_line, rows):
+        # строки разбираются порциями по chunk_size: в памяти одновременно находятся готовые массивы и строки
+        # только одной порции, а не строки всего файла
+        currency_codes = {currency: code for code, currency in enumerate(cls.currencies)}
+        area_codes = {}
+        name_codes = {}
+        chunks = {"salary_from": [np.empty(0, dtype=np.float64)], "salary_to": [np.empty(0, dtype=np.float64)],
+                  "currency": [np.empty(0, dtype=np.int8)], "area": [np.empty(0, dtype=np.int32)],
+                  "year": [np.empty(0, dtype=np.int16)], "month": [np.empty(0, dtype=np.int32)],
+                  "name": [np.empty(0, dtype=np.int32)]}
+        quanity = len(first_line)
+        columns = operator.itemgetter(*[first_line.index(skill) for skill in
+                                        ("salary_from", "salary_to", "salary_currency", "area_name", "published_at",
+                                         "name")])
+        rows = (columns(row) for row in rows if DataSet.check_list(row, quanity))
+        while True:
+            chunk = list(itertools.islice(rows, cls.chunk_size))
+            if not chunk:
+                break
+            salary_from, salary_to, currency, area, published_at, name = zip(*chunk)
+            del chunk
+            year = np.array([value[:4] for value in published_at], dtype=np.int16)
+            chunks["salary_from"].append(np.trunc(np.array(salary_from, dtype=np.float64)))
+            chunks["salary_to"].append(np.trunc(np.array(salary_to, dtype=np.float64)))
+            chunks["currency"].append(np.array([currency_codes[value] for value in currency], dtype=np.int8))
+            chunks["area"].append(np.array([area_codes.setdefault(value, len(area_codes)) for value in area],
+                                           dtype=np.int32))
+            chunks["year"].append(year)
+            chunks["month"].append(year.astype(np.int32) * 12
+                                   + np.array([value[5:7] for value in published_at], dtype=np.int32) - 1)
+            chunks["name"].append(np.array([name_codes.setdefault(value, len(name_codes)) for value in name],
+                                           dtype=np.int32))
+        return cls(**{column: np.concatenate(arrays) for column, arrays in chunks.items()},
+                   areas=list(area_codes.keys()), names=list(name_codes.keys()))
+
+    def get_ru_salary(self, rates=None):
+        if rates is not None:
+            return (self.salary_from + self.salary_to) / 2 * rates.lookup(self.currency, self.month)
+        if self.salary is None:
+            self.salary = self.get_ru_salary(CurrencyRates.static())
+        return self.salary
+
+    def profession_mask(self, profession_name):
+        name_matches = np.array([profession_name in name for name in self.names], dtype=bool)
+        return name_matches[self.name]
+
+    def get_common(self):
+        if self.common is None:
+            self.common = VacanciesAggregate(None, Vocabulary(self.areas))
+            if len(self) > 0:
+                years, year_index = np.unique(self.year, return_inverse=True)
+                self.aggregate_common(self.common, self.get_ru_salary(), years, year_index)
+        return self.common
+
+    def aggregate(self, profession_name, rates=None):
+        aggregate = VacanciesAggregate(profession_name, Vocabulary(self.areas))
+        if len(self) == 0:
+            return aggregate
+        if rates is None and self.index is not None:
+            aggregate.merge(self.get_common())
+            rows = self.index.get_rows(profession_name)
+            self.aggregate_profession(aggregate, self.get_ru_salary()[rows], self.year[rows])
+            return aggregate
+        salary = self.get_ru_salary(rates)
+        years, year_index = np.unique(self.year, return_inverse=True)
+        self.aggregate_common(aggregate, salary, years, year_index)
+        mask = self.profession_mask(profession_name)
+        self.aggregate_profession(aggregate, salary[mask], self.year[mask])
+        return aggregate
+
+    @staticmethod
+    def aggregate_profession(aggregate, salary, year):
+        years, year_index = np.unique(year, return_inverse=True)
+        for year, salary_sum, count in zip(years.tolist(), np.bincount(year_index, weights=salary).tolist(),
+                                           np.bincount(year_index).tolist()):
+            aggregate.by_profession[year] = [salary_sum, count]
+        if len(salary):
+            SalarySketch.fill(aggregate.sketches_by_profession, years.tolist(),
+                              *SalarySketch.count_buckets(year_index, len(years), SalarySketch.get_buckets(salary)))
+
+    def aggregate_professions(self, profession_names, rates=None):
+        aggregates = [VacanciesAggregate(profession_name, Vocabulary(self.areas)) for profession_name in profession_names]
+        if len(self) == 0:
+            return aggregates
+        salary = self.get_ru_salary(rates)
+        years, year_index = np.unique(self.year, return_inverse=True)
+        common = VacanciesAggregate(None, Vocabulary(self.areas))
+        self.aggregate_common(common, salary, years, year_index)
+
+        matcher = ProfessionMatcher(profession_names)
+        name_matches = np.zeros((len(profession_names), len(self.names)), dtype=bool)
+        # названия с одинаковым набором подходящих профессий объединяются, поэтому корзины считаются по группам
+        # (набор, год, корзина), а их число не растёт с количеством строк и различных названий
+        name_signature = np.zeros(len(self.names), dtype=np.int64)
+        signature_codes = {}
+        for code, name in enumerate(self.names):
+            indexes = tuple(sorted(matcher.match(name)))
+            for index in indexes:
+                name_matches[index, code] = True
+            name_signature[code] = signature_codes.setdefault(indexes, len(signature_codes))
+        signatures = np.zeros((len(profession_names), len(signature_codes)), dtype=bool)
+        for indexes, signature in signature_codes.items():
+            signatures[list(indexes), signature] = True
+
+        groups, group_index = np.unique(self.name.astype(np.int64) * len(years) + year_index, return_inverse=True)
+        group_sums = np.bincount(group_index, weights=salary, minlength=len(groups))
+        group_counts = np.bincount(group_index, minlength=len(groups))
+        group_names = groups // len(years)
+        group_years = groups % len(years)
+        signature_groups, signature_buckets, signature_bucket_counts = SalarySketch.count_buckets(
+            name_signature[self.name] * len(years) + year_index, len(signature_codes) * len(years),
+            SalarySketch.get_buckets(salary))
+        signature_bucket_signatures = signature_groups // len(years)
+        signature_bucket_years = signature_groups % len(years)
+        for index, aggregate in enumerate(aggregates):
+            aggregate.merge(common)
+            mask = name_matches[index][group_names]
+            bucket_mask = signatures[index][signature_bucket_signatures]
+            if bucket_mask.any():
+                SalarySketch.fill(aggregate.sketches_by_profession, years.tolist(),
+                                  *SalarySketch.count_buckets(signature_bucket_years[bucket_mask], len(years),
+                                                              signature_buckets[bucket_mask],
+                                                              signature_bucket_counts[bucket_mask]))
+            profession_sums = np.bincount(group_years[mask], weights=group_sums[mask], minlength=len(years))
+            profession_counts = np.bincount(group_years[mask], weights=group_counts[mask], minlength=len(years))
+            for year, salary_sum, count in zip(years.tolist(), profession_sums.tolist(), profession_counts.tolist()):
+                if count:
+                    aggregate.by_profession[year] = [salary_sum, int(count)]
+        return aggregates
+
+    def aggregate_common(self, aggregate, salary, years, year_index):
+        aggregate.vacancies_count = len(self)
+        for year, salary_sum, count in zip(years.tolist(),
+                                           np.bincount(year_index, weights=salary).tolist(),
+                                           np.bincount(year_index).tolist()):
+            aggregate.by_years[year] = [salary_sum, count]
+
+        city_sums = np.bincount(self.area, weights=salary, minlength=len(self.areas))
+        city_counts = np.bincount(self.area, minlength=len(self.areas))
+        for code, (salary_sum, count) in enumerate(zip(city_sums.tolist(), city_counts.tolist())):
+            aggregate.by_cities[code] = [salary_sum, count]
+
+        buckets = SalarySketch.get_buckets(salary)
+        SalarySketch.fill(aggregate.sketches_by_years, years.tolist(),
+                          *SalarySketch.count_buckets(year_index, len(years), buckets))
+        SalarySketch.fill(aggregate.sketches_by_cities, range(len(self.areas)),
+                          *SalarySketch.count_buckets(self.area, len(self.areas), buckets))
+
+
+class SalarySketch:
+    """ Сливаемый скетч квантилей зарплат с логарифмическими корзинами (как DDSketch).
+    Зарплата x попадает в корзину ceil(log(x) / log(gamma)), gamma = (1 + a) / (1 - a), а квантиль возвращается
+    как середина своей корзины 2 * gamma ** i / (gamma + 1), округлённая до рубля. Поэтому оценка q-квантиля
+    отличается от точного значения x_q ранга q * (n - 1) не больше чем на a * x_q + 0.5 (a = relative_accuracy = 1%,
+    0.5 - округление) при любом n и любом порядке слияния: merge только складывает счётчики корзин.
+    Память ограничена диапазоном значений: зарплаты от 1 до 10^9 занимают не больше ~1040 корзин; если корзин больше
+    max_buckets, младшие сливаются в одну, и гарантия перестаёт действовать только для самых нижних квантилей.
+    Зарплаты меньше 1 считаются равными 1
+    """
+    __slots__ = ("buckets",)
+    relative_accuracy = 0.01
+    gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+    log_gamma = math.log(gamma)
+    max_buckets = 2048
+
+    def __init__(self, buckets=None):
+        self.buckets = {} if buckets is None else buckets
+
+    @classmethod
+    def get_buckets(cls, salary):
+        return np.ceil(np.log(np.maximum(salary, 1)) / cls.log_gamma).astype(np.int64)
+
+    @property
+    def count(self):
+        return sum(self.buckets.values())
+
+    def merge(self, other):
+        buckets = self.buckets
+        for bucket, count in other.buckets.items():
+            buckets[bucket] = buckets.get(bucket, 0) + count
+        if len(buckets) > self.max_buckets:
+            self.collapse()
+        return self
+
+    def collapse(self):
+        keys = sorted(self.buckets)
+        lowest = keys[len(keys) - self.max_buckets]
+        self.buckets[lowest] += sum(self.buckets.pop(bucket) for bucket in keys[:len(keys) - self.max_buckets])
+
+    def quantiles(self, *quantiles):
+        count = self.count
+        result = []
+        if count == 0:
+            return [0] * len(quantiles)
+        buckets = sorted(self.buckets.items())
+        for quantile in quantiles:
+            rank = quantile * (count - 1)
+            seen = 0
+            for bucket, bucket_count in buckets:
+                seen += bucket_count
+                if seen > rank:
+                    break
+            # в корзину 0 попадают только зарплаты, равные 1 после замены меньших значений
+            result.append(max(1, round(2 * self.gamma ** bucket / (self.gamma + 1))))
+        return result
+
+    @staticmethod
+    def fill(sketches, keys, groups, buckets, counts):
+        # groups упорядочены, как их возвращает count_buckets: корзины каждой группы идут подряд
+        if len(groups) == 0:
+            return
+        bounds = (np.flatnonzero(np.diff(groups)) + 1).tolist()
+        buckets = buckets.tolist()
+        counts = counts.tolist()
+        for start, end, group in zip([0] + bounds, bounds + [len(buckets)], groups[[0] + bounds].tolist()):
+            group_buckets = dict(zip(buckets[start:end], counts[start:end]))
+            sketch = sketches.get(keys[group])
+            if sketch is None:
+                sketches[keys[group]] = SalarySketch(group_buckets)
+            else:
+                sketch.merge(SalarySketch(group_buckets))
+
+    @staticmethod
+    def count_buckets(group_index, groups_count, buckets, weights=None):
+        offset = int(buckets.min())
+        width = int(buckets.max()) - offset + 1
+        keys = group_index.astype(np.int64) * width + (buckets - offset)
+        if groups_count * width <= 4 * len(keys):
+            counts = np.bincount(keys, weights=weights, minlength=groups_count * width)
+            keys = np.flatnonzero(counts)
+            counts = counts[keys]
+        else:
+            keys, inverse = np.unique(keys, return_inverse=True)
+            counts = np.bincount(inverse.reshape(-1), weights=weights)
+        return keys // width, keys % width + offset, counts.astype(np.int64)
+
+
+class VacanciesAggregate:
+    __slots__ = ("profession_name", "vacancies_count", "by_years", "by_profession", "by_cities", "areas",
+                 "sketches_by_years", "sketches_by_profession", "sketches_by_cities")
+
+    def __init__(self, profession_name, areas=None):
+        self.profession_name = profession_name
+        self.vacancies_count = 0
+        self.by_years = {}
+        self.by_profession = {}
+        self.by_cities = {}
+        self.areas = Vocabulary() if areas is None else areas
+        self.sketches_by_years = {}
+        self.sketches_by_profession = {}
+        self.sketches_by_cities = {}
+
+    def add_vacancies(self, vacancies, names):
+        profession_name = self.profession_name
+        by_years = self.by_years
+        by_profession = self.by_profession
+        by_cities = self.by_cities
+        sketches_by_years = self.sketches_by_years
+        sketches_by_profession = self.sketches_by_profession
+        sketches_by_cities = self.sketches_by_cities
+        log = math.log
+        ceil = math.ceil
+        log_gamma = SalarySketch.log_gamma
+        name_matches = {}
+        for vacancie in vacancies:
+            salary = vacancie.ru_salary
+            vacancie_year = vacancie.year
+            bucket = ceil(log(salary) / log_gamma) if salary > 1 else 0
+            accumulator = by_years.get(vacancie_year)
+            if accumulator is None:
+                by_years[vacancie_year] = [salary, 1]
+                sketches_by_years[vacancie_year] = SalarySketch({bucket: 1})
+            else:
+                accumulator[0] += salary
+                accumulator[1] += 1
+                buckets = sketches_by_years[vacancie_year].buckets
+                buckets[bucket] = buckets.get(bucket, 0) + 1
+            accumulator = by_cities.get(vacancie.area_name)
+            if accumulator is None:
+                by_cities[vacancie.area_name] = [salary, 1]
+                sketches_by_cities[vacancie.area_name] = SalarySketch({bucket: 1})
+            else:
+                accumulator[0] += salary
+                accumulator[1] += 1
+                buckets = sketches_by_cities[vacancie.area_name].buckets
+                buckets[bucket] = buckets.get(bucket, 0) + 1
+            matches = name_matches.get(vacancie.name)
+            if matches is None:
+                matches = name_matches[vacancie.name] = profession_name in names.values[vacancie.name]
+            if matches:
+                accumulator = by_profession.get(vacancie_year)
+                if accumulator is None:
+                    by_profession[vacancie_year] = [salary, 1]
+                    sketches_by_profession[vacancie_year] = SalarySketch({bucket: 1})
+                else:
+                    accumulator[0] += salary
+                    accumulator[1] += 1
+                    buckets = sketches_by_profession[vacancie_year].buckets
+                    buckets[bucket] = buckets.get(bucket, 0) + 1
+            self.vacancies_count += 1
+
+    def merge(self, other):
+        self.vacancies_count += other.vacancies_count
+        if other.areas is self.areas:
+            other_cities = other.by_cities
+            other_city_sketches = other.sketches_by_cities
+        else:
+            codes = {code: self.areas.encode(other.areas.values[code]) for code in other.by_cities}
+            other_cities = {codes[code]: accumulator for code, accumulator in other.by_cities.items()}
+            other_city_sketches = {codes[code]: sketch for code, sketch in other.sketches_by_cities.items()}
+        for own, others in ((self.by_years, other.by_years), (self.by_profession, other.by_profession),
+                            (self.by_cities, other_cities)):
+            for key, (salary_sum, count) in others.items():
+                accumulator = own.get(key)
+                if accumulator is None:
+                    own[key] = [salary_sum, count]
+                else:
+                    accumulator[0] += salary_sum
+                    accumulator[1] += count
+        for own, others in ((self.sketches_by_years, other.sketches_by_years),
+                            (self.sketches_by_profession, other.sketches_by_profession),
+                            (self.sketches_by_cities, other_city_sketches)):
+            for key, sketch in others.items():
+                own_sketch = own.get(key)
+                if own_sketch is None:
+                    own[key] = SalarySketch(dict(sketch.buckets))
+                else:
+                    own_sketch.merge(sketch)
+        return self
+
+    def to_dict(self):
+        return {"profession_name": self.profession_name, "vacancies_count": self.vacancies_count,
+                "by_years": list(self.by_years.items()), "by_profession": list(self.by_profession.items()),
+                "by_cities": list(self.by_cities.items()), "areas": self.areas.values,
+                "sketches_by_years": [(key, list(sketch.buckets.items()))
+                                      for key, sketch in self.sketches_by_years.items()],
+                "sketches_by_profession": [(key, list(sketch.buckets.items()))
+                                           for key, sketch in self.sketches_by_profession.items()],
+                "sketches_by_cities": [(key, list(sketch.buckets.items()))
+                                       for key, sketch in self.sketches_by_cities.items()]}
+
+    @classmethod
+    def from_dict(cls, data):
+        aggregate = cls(data["profession_name"], Vocabulary(data["areas"]))
+        aggregate.vacancies_count = data["vacancies_count"]
+        aggregate.by_years = {key: list(value) for key, value in data["by_years"]}
+        aggregate.by_profession = {key: list(value) for key, value in data["by_profession"]}
+        aggregate.by_cities = {key: list(value) for key, value in data["by_cities"]}
+        aggregate.sketches_by_years = {key: SalarySketch(dict(buckets))
+                                       for key, buckets in data.get("sketches_by_years", [])}
+        aggregate.sketches_by_profession = {key: SalarySketch(dict(buckets))
+                                            for key, buckets in data.get("sketches_by_profession", [])}
+        aggregate.sketches_by_cities = {key: SalarySketch(dict(buckets))
+                                        for key, buckets in data.get("sketches_by_cities", [])}
+        return aggregate
+
+
+def make_aggregate(data):
+    vacancies, profession_name, vocabularies = data
+    aggregate = VacanciesAggregate(profession_name, vocabularies["area_name"])
+    aggregate.add_vacancies(vacancies, vocabularies["name"])
+    return aggregate
+
+
+def aggregate_table(data):
+    rates = CurrencyRates.from_csv(data[2]) if len(data) > 2 and data[2] else None
+    return VacancyTable.load(data[0]).aggregate(data[1], rates)
+
+
+def aggregate_table_professions(data):
+    rates = CurrencyRates.from_csv(data[2]) if len(data) > 2 and data[2] else None
+    return VacancyTable.load(data[0]).aggregate_professions(data[1], rates)
+
+
+def table_byte_range(data):
+    file_name, header, (start, end) = data
+    return VacancyTable.from_rows(header, DataSet.read_byte_range(file_name, start, end))
+
+
+def aggregate_byte_range(data):
+    file_name, header, byte_range, profession_name, rates_file = data
+    rates = CurrencyRates.from_csv(rates_file) if rates_file else None
+    return table_byte_range((file_name, header, byte_range)).aggregate(profession_name, rates)
+
+
+class AggregateState:
+    def __init__(self, profession_name, aggregate=None, watermark=None):
+        self.profession_name = profession_name
+        self.aggregate = VacanciesAggregate(profession_name) if aggregate is None else aggregate
+        self.watermark = watermark
+
+    @staticmethod
+    def parse_date(published_at):
+        return datetime.datetime.strptime(published_at, "%Y-%m-%dT%H:%M:%S%z").timestamp()
+
+    @classmethod
+    def load(cls, file_name, profession_name):
+        if not os.path.exists(file_name):
+            return cls(profession_name)
+        with open(file_name, "r", encoding='utf_8') as state_file:
+            state = json.load(state_file)
+        if state["profession_name"] != profession_name:
+            raise ValueError(f"Состояние {file_name} собрано для профессии {state['profession_name']}")
+        return cls(profession_name, VacanciesAggregate.from_dict(state["aggregate"]), state["watermark"])
+
+    def save(self, file_name):
+        with open(file_name + ".tmp", "w", encoding='utf_8') as state_file:
+            json.dump({"profession_name": self.profession_name, "watermark": self.watermark,
+                       "aggregate": self.aggregate.to_dict()}, state_file, ensure_ascii=False)
+        os.replace(file_name + ".tmp", file_name)
+
+    def update(self, file_name):
+        # строки не позже watermark, в том числе опоздавшие и опубликованные в ту же секунду, не добавляются:
+        # их количество возвращается вторым значением, чтобы пропуск был виден
+        watermark = self.watermark
+        latest = [watermark]
+        skipped = [0]
+
+        def new_vacancies(vacancies):
+            for vacancy in vacancies:
+                published_at = self.parse_date(vacancy.published_at)
+                if watermark is None or published_at > watermark:
+                    if latest[0] is None or published_at > latest[0]:
+                        latest[0] = published_at
+                    yield vacancy
+                else:
+                    skipped[0] += 1
+
+        vocabularies = DataSet.make_vocabularies()
+        aggregate = make_aggregate((new_vacancies(DataSet.iter_vacancies(file_name, vocabularies)),
+                                    self.profession_name, vocabularies))
+        self.aggregate.merge(aggregate)
+        self.watermark = latest[0]
+        return aggregate.vacancies_count, skipped[0]
 
 
 class Statistics():
@@ -115,6 +935,18 @@ class Statistics():
 
         self.vacancies = data[0]
         self.profession_name = data[1]
+        self.make_statistics(make_aggregate(data))
+
+    @classmethod
+    def from_aggregate(cls, aggregate):
+        statistics = cls.__new__(cls)
+        statistics.vacancies = []
+        statistics.profession_name = aggregate.profession_name
+        statistics.make_statistics(aggregate)
+        return statistics
+
+    def make_statistics(self, aggregate):
+        self.aggregate = aggregate
         self.suitable_cities = []
         self.share_of_cities = self.make_share_of_cities()
         self.salary_by_years = self.make_salary_by_years()
@@ -122,40 +954,44 @@ class Statistics():
         self.salary_by_profession = self.make_salary_by_profession()
         self.quantity_by_profession = self.make_quantity_by_profession()
         self.salary_by_cities = self.make_salary_by_sities()
+        self.quantiles_by_years = self.make_quantiles(self.aggregate.sketches_by_years)
+        self.quantiles_by_profession = self.make_quantiles(self.aggregate.sketches_by_profession) or {2022: [0, 0, 0]}
+        self.quantiles_by_cities = self.make_quantiles_by_cities()
+
+    @staticmethod
+    def make_quantiles(sketches):
+        return {year: sketches[year].quantiles(0.1, 0.5, 0.9) for year in sorted(sketches)}
+
+    def make_quantiles_by_cities(self):
+        sketches = self.aggregate.sketches_by_cities
+        quantiles_by_cities = {area_code: sketches[area_code].quantiles(0.1, 0.5, 0.9)
+                               for area_code in self.suitable_cities if area_code in sketches}
+        # медианы округляются до середин корзин и часто совпадают, поэтому при равенстве порядок задают точное
+        # среднее и название города, а не порядок, в котором города встретились при слиянии
+        areas = self.aggregate.areas.values
+        by_cities = self.aggregate.by_cities
+        quantiles_by_cities = sorted(quantiles_by_cities.items(),
+                                     key=lambda x: (-x[1][1], -by_cities[x[0]][0] / by_cities[x[0]][1], areas[x[0]]))
+        return {areas[area_code]: quantiles for area_code, quantiles in quantiles_by_cities[:10]}
 
     def make_salary_by_years(self):
         salary_by_years = {}
-        for vacancie in self.vacancies:
-            vacancie_year = int(datetime.datetime.strptime(vacancie.published_at, "%Y-%m-%dT%H:%M:%S%z").strftime("%Y"))
-            if vacancie_year not in salary_by_years.keys():
-                salary_by_years[vacancie_year] = []
-            salary_by_years[vacancie_year].append(vacancie.get_ru_salary())
-        for year in salary_by_years.keys():
-            salary_by_years[year] = int(mean(salary_by_years[year]))
+        for year, (salary_sum, count) in self.aggregate.by_years.items():
+            salary_by_years[year] = int(salary_sum / count)
         salary_by_years = dict(sorted(salary_by_years.items(), key=lambda x: x[0]))
         return salary_by_years
 
     def make_quantity_by_years(self):
         quantity_by_years = {}
-        for vacancie in self.vacancies:
-            vacancie_year = int(datetime.datetime.strptime(vacancie.published_at, "%Y-%m-%dT%H:%M:%S%z").strftime("%Y"))
-            if vacancie_year not in quantity_by_years.keys():
-                quantity_by_years[vacancie_year] = 0
-            quantity_by_years[vacancie_year] += 1
+        for year, (salary_sum, count) in self.aggregate.by_years.items():
+            quantity_by_years[year] = count
         quantity_by_years = dict(sorted(quantity_by_years.items(), key=lambda x: x[0]))
         return quantity_by_years
 
     def make_salary_by_profession(self):
         salary_by_years = {}
-        for vacancie in self.vacancies:
-            if self.profession_name not in vacancie.name:
-                continue
-            vacancie_year = int(datetime.datetime.strptime(vacancie.published_at, "%Y-%m-%dT%H:%M:%S%z").strftime("%Y"))
-            if vacancie_year not in salary_by_years.keys():
-                salary_by_years[vacancie_year] = []
-            salary_by_years[vacancie_year].append(vacancie.get_ru_salary())
-        for year in salary_by_years.keys():
-            salary_by_years[year] = int(mean(salary_by_years[year]))
+        for year, (salary_sum, count) in self.aggregate.by_profession.items():
+            salary_by_years[year] = int(salary_sum / count)
         salary_by_years = dict(sorted(salary_by_years.items(), key=lambda x: x[0]))
         if len(salary_by_years.keys()) == 0:
             salary_by_years[2022] = 0
@@ -163,13 +999,8 @@ class Statistics():
 
     def make_quantity_by_profession(self):
         quantity_by_years = {}
-        for vacancie in self.vacancies:
-            if self.profession_name not in vacancie.name:
-                continue
-            vacancie_year = int(datetime.datetime.strptime(vacancie.published_at, "%Y-%m-%dT%H:%M:%S%z").strftime("%Y"))
-            if vacancie_year not in quantity_by_years.keys():
-                quantity_by_years[vacancie_year] = 0
-            quantity_by_years[vacancie_year] += 1
+        for year, (salary_sum, count) in self.aggregate.by_profession.items():
+            quantity_by_years[year] = count
         quantity_by_years = dict(sorted(quantity_by_years.items(), key=lambda x: x[0]))
         if len(quantity_by_years.keys()) == 0:
             quantity_by_years[2022] = 0
@@ -177,58 +1008,129 @@ class Statistics():
 
     def make_salary_by_sities(self):
         salary_by_cities = {}
-        for vacancie in self.vacancies:
-            if vacancie.area_name not in self.suitable_cities:
-                continue
-            vacancie_city = vacancie.area_name
-            if vacancie_city not in salary_by_cities.keys():
-                salary_by_cities[vacancie_city] = []
-            salary_by_cities[vacancie_city].append(vacancie.get_ru_salary())
-        for area_name in salary_by_cities.keys():
-            salary_by_cities[area_name] = int(mean(salary_by_cities[area_name]))
+        for area_code in self.suitable_cities:
+            salary_sum, count = self.aggregate.by_cities[area_code]
+            salary_by_cities[area_code] = int(salary_sum / count)
         salary_by_cities = sorted(salary_by_cities.items(), key=lambda x: x[1], reverse=True)
-        salary_by_cities = dict(salary_by_cities[:min(10,len(salary_by_cities))])
-        return salary_by_cities
+        salary_by_cities = salary_by_cities[:min(10,len(salary_by_cities))]
+        return {self.aggregate.areas.values[area_code]: salary for area_code, salary in salary_by_cities}
 
     def make_share_of_cities(self):
-        vacancies_quantity = len(self.vacancies)
+        vacancies_quantity = self.aggregate.vacancies_count
         share_of_cities = {}
         pop_names= []
-        for vacancie in self.vacancies:
-            vacancie_city = vacancie.area_name
-            if vacancie_city not in share_of_cities.keys():
-                share_of_cities[vacancie_city] = 0
-            share_of_cities[vacancie_city] += 1
-        for area_name in share_of_cities.keys():
-            share_of_cities[area_name] = round(share_of_cities[area_name]/vacancies_quantity,4)
-            if share_of_cities[area_name]<0.01:
-                pop_names.append(area_name)
+        for area_code, (salary_sum, count) in self.aggregate.by_cities.items():
+            share_of_cities[area_code] = count
+        for area_code in share_of_cities.keys():
+            share_of_cities[area_code] = round(share_of_cities[area_code]/vacancies_quantity,4)
+            if share_of_cities[area_code]<0.01:
+                pop_names.append(area_code)
             else:
-                self.suitable_cities.append(area_name)
-               # print(area_name, share_of_cities[area_name])
+                self.suitable_cities.append(area_code)
         for a in pop_names:
             share_of_cities.pop(a)
         share_of_cities = sorted(share_of_cities.items(), key=lambda x: x[1], reverse=True)
-        share_of_cities = dict(share_of_cities[:min(10,len(share_of_cities))])
-        return share_of_cities
+        share_of_cities = share_of_cities[:min(10,len(share_of_cities))]
+        return {self.aggregate.areas.values[area_code]: share for area_code, share in share_of_cities}
+
+
+class StatisticsCache:
+    fields = ("salary_by_years", "quantity_by_years", "salary_by_profession", "quantity_by_profession",
+              "salary_by_cities", "share_of_cities", "quantiles_by_years", "quantiles_by_profession",
+              "quantiles_by_cities")
+    version = 3
+
+    def __init__(self, folder=".statistics_cache", max_size=16 << 20):
+        self.folder = folder
+        self.max_size = max_size
+
+    @staticmethod
+    def get_key(file_names, profession_name, rates_file=None):
+        key = hashlib.blake2b(digest_size=16)
+        for file_name in sorted(file_names) + ([rates_file] if rates_file else []):
+            stat = os.stat(file_name)
+            key.update(f"{os.path.abspath(file_name)}|{stat.st_size}|{stat.st_mtime_ns}\n".encode())
+        key.update(f"{profession_name}|{StatisticsCache.version}".encode())
+        return key.hexdigest()
+
+    def get(self, key):
+        file_name = os.path.join(self.folder, f"{key}.json")
+        try:
+            with open(file_name, "r", encoding='utf_8') as cache_file:
+                values = json.load(cache_file)
+        except (OSError, ValueError):
+            return None
+        os.utime(file_name)
+        return {field: dict(map(tuple, values[field])) for field in self.fields}
+
+    def put(self, key, statistics):
+        os.makedirs(self.folder, exist_ok=True)
+        file_name = os.path.join(self.folder, f"{key}.json")
+        with open(file_name + ".tmp", "w", encoding='utf_8') as cache_file:
+            json.dump({field: list(getattr(statistics, field).items()) for field in self.fields}, cache_file,
+                      ensure_ascii=False)
+        os.replace(file_name + ".tmp", file_name)
+        self.evict()
+
+    def evict(self):
+        entries = []
+        for entry in os.scandir(self.folder):
+            if entry.name.endswith(".json"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        total_size = sum(size for mtime, size, path in entries)
+        for mtime, size, path in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            os.remove(path)
+            total_size -= size
 
 
 class MultipleReader:
-    def __init__(self):
-        self.file_names = self.get_file_names(r"C:\Users\79823\Desktop\SiMiZZZ\Python_tasks_2.3\CSV_files")
+    def __init__(self, folder_name=r"C:\Users\79823\Desktop\SiMiZZZ\Python_tasks_2.3\CSV_files"):
+        self.file_names = self.get_file_names(folder_name)
         self.datasets = [(lambda x: DataSet(x))(i) for i in self.file_names]
 
     def get_file_names(self, folder_name):
         file_names_list = [i[2] for i in os.walk(rf'{folder_name}')][0]
-        file_names_list = list(map(lambda x: f"CSV_files/{x}", file_names_list))
+        file_names_list = list(map(lambda x: os.path.join(folder_name, x), sorted(file_names_list)))
         return file_names_list
 
     def reader(self):
         with concurrent.futures.ProcessPoolExecutor() as pool:
-            vacancies = pool.map(DataSet.csv_reader, self.file_names)
+            vacancies = instrumentation.map_timed(pool, DataSet.csv_reader, self.file_names,
+                                                  labels=self.file_names, rows=lambda x: len(x[1]))
 
         return vacancies
 
+    def aggregate(self, vacancie_name, rates_file=None):
+        with concurrent.futures.ProcessPoolExecutor() as pool:
+            aggregates = instrumentation.map_timed(
+                pool, aggregate_table, tuple(map(lambda x: (x, vacancie_name, rates_file), self.file_names)),
+                labels=self.file_names, rows=operator.attrgetter("vacancies_count"))
+
+        return aggregates
+
+    def aggregate_professions(self, profession_names, rates_file=None):
+        with concurrent.futures.ProcessPoolExecutor() as pool:
+            aggregates = instrumentation.map_timed(
+                pool, aggregate_table_professions,
+                tuple(map(lambda x: (x, profession_names, rates_file), self.file_names)),
+                labels=self.file_names, rows=lambda x: x[0].vacancies_count if x else 0)
+
+        return aggregates
+
+
+class TableReader:
+    def __init__(self, file_name):
+        self.file_names = [file_name]
+
+    def aggregate(self, vacancie_name, rates_file=None):
+        return [aggregate_table((self.file_names[0], vacancie_name, rates_file))]
+
+    def aggregate_professions(self, profession_names, rates_file=None):
+        return [aggregate_table_professions((self.file_names[0], profession_names, rates_file))]
+
 
 class MultipleStatistics:
 
@@ -240,45 +1142,150 @@ class MultipleStatistics:
         self.salary_by_profession = {}
         self.quantity_by_profession = {}
         self.salary_by_cities = {}
+        self.quantiles_by_years = {}
+        self.quantiles_by_profession = {}
+        self.quantiles_by_cities = {}
 
     def get_statistic(self, vacancies):
-        vacancies = list(map(DataSet.set_class_values, vacancies))
+        vacancies = list(map(lambda x: (DataSet.set_class_values(x[1]), self.vacancie_name, x[0]), vacancies))
         with concurrent.futures.ProcessPoolExecutor() as pool:
-            statistics = pool.map(Statistics, tuple(map(lambda x: (x, self.vacancie_name), vacancies)))
-
-        return list(statistics)
-
-    def merge_statistics(self, statistics):
-        for instance in statistics:
-            year = list(instance.salary_by_years.keys())[0]
-            self.salary_by_years[year] = instance.salary_by_years[year]
-            self.quantity_by_years[year] = instance.quantity_by_years[year]
-            self.salary_by_profession[year] = instance.salary_by_profession[year]
-            self.quantity_by_profession[year] = instance.quantity_by_profession[year]
-            for city in instance.salary_by_cities.keys():
-                if city not in self.salary_by_cities:
-                    self.salary_by_cities[city] = instance.salary_by_cities[city]
-                else:
-                    self.salary_by_cities[city] += instance.salary_by_cities[city]
+            aggregates = instrumentation.map_timed(pool, make_aggregate, vacancies,
+                                                   rows=operator.attrgetter("vacancies_count"))
 
-            for city in instance.share_of_cities.keys():
-                if city not in self.share_of_cities:
-                    self.share_of_cities[city] = instance.share_of_cities[city]
+        return aggregates
+
+    def merge_statistics(self, aggregates):
+        aggregate = VacanciesAggregate(self.vacancie_name)
+        for instance in aggregates:
+            aggregate.merge(instance)
+        statistic = Statistics.from_aggregate(aggregate)
+        self.salary_by_years = statistic.salary_by_years
+        self.quantity_by_years = statistic.quantity_by_years
+        self.salary_by_profession = statistic.salary_by_profession
+        self.quantity_by_profession = statistic.quantity_by_profession
+        self.salary_by_cities = statistic.salary_by_cities
+        self.quantiles_by_years = statistic.quantiles_by_years
+        self.quantiles_by_profession = statistic.quantiles_by_profession
+        self.quantiles_by_cities = statistic.quantiles_by_cities
+        for city in statistic.share_of_cities.keys():
+            self.share_of_cities[city] = '{:.3f}'.format(statistic.share_of_cities[city])
+
+    def collect(self, multiple_reader, rates_file=None, cache=None):
+        if cache is not None:
+            with instrumentation.stage("cache_lookup") as record:
+                key = cache.get_key(multiple_reader.file_names, self.vacancie_name, rates_file)
+                values = cache.get(key)
+                record["hit"] = values is not None
+            if values is not None:
+                for field, value in values.items():
+                    setattr(self, field, value)
+                return self
+        with instrumentation.stage("aggregate") as record:
+            aggregates = multiple_reader.aggregate(self.vacancie_name, rates_file)
+            record["rows"] = sum(instance.vacancies_count for instance in aggregates)
+        with instrumentation.stage("merge_statistics"):
+            self.merge_statistics(aggregates)
+        if cache is not None:
+            cache.put(key, self)
+        return self
+
+    @staticmethod
+    def merge_professions(profession_names, aggregates):
+        statistics = {}
+        for index, profession_name in enumerate(profession_names):
+            statistics[profession_name] = MultipleStatistics(profession_name)
+            statistics[profession_name].merge_statistics([instance[index] for instance in aggregates])
+        return statistics
+
+server_tables = []
+
+
+def load_server_tables(file_names):
+    server_tables[:] = [VacancyTable.load(file_name) for file_name in file_names]
+
+
+def aggregate_server_table(data):
+    index, profession_names, rates_file = data
+    rates = CurrencyRates.from_csv(rates_file) if rates_file else None
+    if len(profession_names) == 1:
+        return [server_tables[index].aggregate(profession_names[0], rates)]
+    return server_tables[index].aggregate_professions(profession_names, rates)
+
+
+class StatisticsServer:
+    def __init__(self, folder_name, rates_file=None, workers=None):
+        self.file_names = MultipleReader(folder_name).file_names
+        self.rates_file = rates_file
+        load_server_tables(self.file_names)
+        self.pool = concurrent.futures.ProcessPoolExecutor(workers, initializer=load_server_tables,
+                                                           initargs=(self.file_names,))
+        list(self.pool.map(len, [()] * (workers or os.cpu_count() or 1)))
+
+    def query(self, profession_names):
+        aggregates = list(self.pool.map(aggregate_server_table,
+                                        [(index, profession_names, self.rates_file)
+                                         for index in range(len(self.file_names))]))
+        statistics = MultipleStatistics.merge_professions(profession_names, aggregates)
+        return {profession_name: {field: list(getattr(statistics[profession_name], field).items())
+                                  for field in StatisticsCache.fields}
+                for profession_name in profession_names}
+
+    def make_handler(self):
+        # http.server нужен только серверу, без него подсчёт статистики запускается быстрее
+        import http.server
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urllib.parse.urlparse(self.path)
+                parameters = urllib.parse.parse_qs(url.query, keep_blank_values=True)
+                if url.path == "/health":
+                    self.send_json(200, {"files": len(server.file_names), "rows": sum(map(len, server_tables))})
+                elif url.path == "/statistics" and parameters.get("profession"):
+                    try:
+                        body = server.query(parameters["profession"])
+                    except Exception as error:
+                        self.send_json(500, {"error": f"{type(error).__name__}: {error}"})
+                    else:
+                        self.send_json(200, body)
                 else:
-                    self.share_of_cities[city] += instance.share_of_cities[city]
+                    self.send_json(404, {"error": "GET /statistics?profession=<название>[&profession=...]"})
+
+            def send_json(self, status, body):
+                body = json.dumps(body, ensure_ascii=False).encode('utf_8')
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def make_server(self, host="127.0.0.1", port=8000):
+        import http.server
+        return http.server.ThreadingHTTPServer((host, port), self.make_handler())
+
+    def serve(self, host="127.0.0.1", port=8000):
+        httpd = self.make_server(host, port)
+        try:
+            httpd.serve_forever()
+        finally:
+            httpd.server_close()
+            self.close()
+
+    def close(self):
+        self.pool.shutdown()
 
-        for city in self.salary_by_cities.keys():
-            self.salary_by_cities[city] = int(self.salary_by_cities[city]/len(statistics))
-        for city in self.share_of_cities.keys():
-            self.share_of_cities[city] = '{:.3f}'.format(self.share_of_cities[city] / len(statistics))
 
 if __name__ == "__main__":
     vacancie_name = input("Введите название вакансии: ")
     multiple_reader = MultipleReader()
-    vacancies = multiple_reader.reader()
     multiple_statistics = MultipleStatistics(vacancie_name)
-    statistics = multiple_statistics.get_statistic(vacancies)
-    multiple_statistics.merge_statistics(statistics)
+    with instrumentation.run("3-2-3"):
+        multiple_statistics.collect(multiple_reader, cache=StatisticsCache())
 
     print(f"Динамика уровня зарплат по годам: {multiple_statistics.salary_by_years}")
     print(f"Динамика количества вакансий по годам: {multiple_statistics.quantity_by_years}")
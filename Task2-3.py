@@ -1,16 +1,31 @@
 import re
+import io
+import os
 import csv
-import datetime
+import time
+import base64
+import operator
+import functools
+import concurrent.futures
 import unittest
-from statistics import mean
-from matplotlib import pyplot as plt
-from openpyxl import Workbook
-from openpyxl.utils import get_column_letter
-from openpyxl.styles import Font, Alignment, Border, Side
-from jinja2 import Environment, FileSystemLoader
-import pdfkit
-import doctest
+import instrumentation
 from unittest import TestCase
+# matplotlib, openpyxl, jinja2 и pdfkit импортируются внутри функций отчётов,
+# чтобы подсчёт статистики без отчётов не тратил на их загрузку сотни миллисекунд
+
+
+CURRENCY_TO_RUB = {
+    "AZN": 35.68,
+    "BYR": 23.91,
+    "EUR": 59.90,
+    "GEL": 21.74,
+    "KGS": 0.76,
+    "KZT": 0.13,
+    "RUR": 1,
+    "UAH": 1.64,
+    "USD": 60.66,
+    "UZS": 0.0055,
+}
 
 
 class Vacancy:
@@ -18,43 +33,41 @@ class Vacancy:
 
     Attributes:
         name (str) : Название вакансии
-        salary_from (str or float) : Нижняя граница вилки оклада
-        salary_to (str or float) : Верняя граница вилки оклада
+        salary_from (int) : Нижняя граница вилки оклада
+        salary_to (int) : Верняя граница вилки оклада
         salary_currency (str) : Валюта оклада
         area_name (str) : Город/страна публикации вакансии
-        published_at (str or datetime) : Дата публикации вакансии
+        published_at (str) : Дата публикации вакансии
+        year (int) : Год публикации вакансии
+        ru_salary (float) : Средний оклад вакансии в рублях
     """
+    __slots__ = ("name", "salary_from", "salary_to", "salary_currency", "area_name", "published_at", "year",
+                 "ru_salary")
+    fields = ("name", "salary_from", "salary_to", "salary_currency", "area_name", "published_at")
 
-    def __init__(self):
-        """Инициализирует объект вакансии и объявляет нужные переменные класса
+    def __init__(self, name, salary_from, salary_to, salary_currency, area_name, published_at):
+        """Инициализирует объект вакансии, один раз приводя оклад, валюту и год к нужным типам
 
+        >>> Vacancy("Программист", "10000.0", "20000.0", "EUR", "Москва", "2022-07-05T18:19:30+0300").year
+        2022
+        >>> Vacancy("Программист", "10000.0", "20000.0", "EUR", "Москва", "2022-07-05T18:19:30+0300").ru_salary
+        898500.0
         """
-        self.name = str()
-        self.salary_from = str()
-        self.salary_to = str()
-        self.salary_currency = str()
-        self.area_name = str()
-        self.published_at = str()
+        self.name = name
+        self.salary_from = int(float(salary_from))
+        self.salary_to = int(float(salary_to))
+        self.salary_currency = salary_currency
+        self.area_name = area_name
+        self.published_at = published_at
+        self.year = int(published_at[:4])
+        self.ru_salary = (self.salary_from + self.salary_to) / 2 * CURRENCY_TO_RUB[salary_currency]
 
     def get_ru_salary(self):
         """ Приводит оклад из разных валют к рублёвым
 
         :return: Рублёвое значение оклада вакансии
         """
-        self.currency_to_rub = {
-        "AZN": 35.68,
-        "BYR": 23.91,
-        "EUR": 59.90,
-        "GEL": 21.74,
-        "KGS": 0.76,
-        "KZT": 0.13,
-        "RUR": 1,
-        "UAH": 1.64,
-        "USD": 60.66,
-        "UZS": 0.0055,
-        }
-        return (int(float(self.salary_from)) + int(float(self.salary_to))) / 2 * self.currency_to_rub[
-                    self.salary_currency]
+        return self.ru_salary
 
 class DataSet():
     """ Класс представления данных, полученных из csv файла
@@ -62,7 +75,12 @@ class DataSet():
     Attributes:
         file_name (str) : Название csv файла
         vacancies_objects (list(Vacancie)) : Лист вакансий, полученных из csv файла
+        html_pattern (Pattern) : Скомпилированное регулярное выражение для HTML тегов
+        plain_columns (tuple(str)) : Числовые столбцы и столбцы с датой и валютой, в которых не бывает разметки
     """
+    html_pattern = re.compile(r'\<[^>]*\>')
+    plain_columns = ("salary_from", "salary_to", "salary_currency", "published_at")
+
     def __init__(self, file_name):
         """ Инициализирует объект DataSet
 
@@ -143,23 +161,50 @@ class DataSet():
         >>> DataSet("vacancies_by_year.csv").clear_list("<html><b><br></b></html>")
         ''
         """
-        value = re.sub(r'\<[^>]*\>', '', value)
+        value = self.html_pattern.sub('', value)
         return value
 
+    def clear_text(self, value):
+        """ Чистит строку от HTML тегов и лишних пробелов, не запуская регулярное выражение для строк без "<"
+
+        :param value: строка из текстового столбца
+        :return: Строка без html тегов, в которой пробелы схлопнуты в один
+        >>> DataSet("vacancies_by_year.csv").clear_text("  <b>Чистая</b>\\t   строка ")
+        'Чистая строка'
+        >>> DataSet("vacancies_by_year.csv").clear_text("Программист 1С")
+        'Программист 1С'
+        """
+        if '<' in value:
+            value = self.html_pattern.sub('', value)
+        return " ".join(value.split())
+
+    def clear_plain(self, value):
+        """ Чистит значение числового столбца или столбца с датой: ASCII строки без пробелов и "<" не меняются
+
+        :param value: строка из числового столбца или столбца с датой
+        :return: То же значение, что вернула бы clear_text
+        >>> DataSet("vacancies_by_year.csv").clear_plain("2022-07-05T18:19:30+0300")
+        '2022-07-05T18:19:30+0300'
+        >>> DataSet("vacancies_by_year.csv").clear_plain(" 100 000.0")
+        '100 000.0'
+        """
+        if value.isascii() and value.isprintable() and ' ' not in value and '<' not in value:
+            return value
+        return self.clear_text(value)
+
     def csv_filer(self, reader, list_naming):
-        """Преобразует лист строк csv файла в лист словарей, с ключами из заголовка файла
+        """Преобразует лист строк csv файла в лист словарей, с ключами из заголовка файла.
+        Строки чистятся по столбцам: для каждого столбца выбирается своя функция очистки
 
         :param reader (list(str)): Заголовок csv файла
         :param list_naming (list(str)): Лист строк csv файла
         :return: (list(dict)) Лист словарей вакансий, с ключами из заголовка csv файла
         """
-        vacancies = []
-        for vacancie in list_naming:
-            clear_naming = {}
-            for index, skill in enumerate(reader):
-                clear_naming[skill] = " ".join(self.clear_list(vacancie[index]).split())
-            vacancies.append(clear_naming)
-        return vacancies
+        columns = []
+        for index, skill in enumerate(reader):
+            clear = self.clear_plain if skill in self.plain_columns else self.clear_text
+            columns.append(list(map(clear, [vacancie[index] for vacancie in list_naming])))
+        return [dict(zip(reader, values)) for values in zip(*columns)]
 
 class InputCorrect():
     """Класс для первичной записи названия файла, названия профессии
@@ -201,6 +246,61 @@ class InputCorrect():
                     return False
             return True
 
+class VacanciesAggregate:
+    """Класс накопления статистики по вакансиям за один проход по данным
+
+    Attributes:
+        profession_name (str): Название профессии, по которой накапливается статистика
+        vacancies_count (int): Количество учтённых вакансий
+        by_years (dict): Сумма зарплат и количество вакансий по годам, {год: [сумма, количество]}
+        by_profession (dict): Сумма зарплат и количество вакансий профессии по годам
+        by_cities (dict): Сумма зарплат и количество вакансий по городам
+    """
+    def __init__(self, profession_name):
+        """Инициализирует пустой накопитель статистики
+
+        :param profession_name (str): Название профессии
+        """
+        self.profession_name = profession_name
+        self.vacancies_count = 0
+        self.by_years = {}
+        self.by_profession = {}
+        self.by_cities = {}
+
+    def add_vacancies(self, vacancies):
+        """Добавляет вакансии в накопитель: каждая вакансия разбирается ровно один раз
+
+        :param vacancies list(Vacancie): Лист вакансий
+        """
+        profession_name = self.profession_name
+        by_years = self.by_years
+        by_profession = self.by_profession
+        by_cities = self.by_cities
+        for vacancie in vacancies:
+            salary = vacancie.ru_salary
+            vacancie_year = vacancie.year
+            accumulator = by_years.get(vacancie_year)
+            if accumulator is None:
+                by_years[vacancie_year] = [salary, 1]
+            else:
+                accumulator[0] += salary
+                accumulator[1] += 1
+            accumulator = by_cities.get(vacancie.area_name)
+            if accumulator is None:
+                by_cities[vacancie.area_name] = [salary, 1]
+            else:
+                accumulator[0] += salary
+                accumulator[1] += 1
+            if profession_name in vacancie.name:
+                accumulator = by_profession.get(vacancie_year)
+                if accumulator is None:
+                    by_profession[vacancie_year] = [salary, 1]
+                else:
+                    accumulator[0] += salary
+                    accumulator[1] += 1
+            self.vacancies_count += 1
+
+
 class Statistics():
     """Класс реализации подведения статистики по полученным данным из файла
 
@@ -208,6 +308,7 @@ class Statistics():
         vacancies list(Vacancie): Список вакансий
         profession_name (str): Имя професии
         suitavle_cities (str):
+        aggregate (VacanciesAggregate): Суммы и количества, накопленные за один проход по вакансиям
     """
     def __init__(self, vacancies, profession_name):
         """Инициализирует класс статистики, и высчитывает все статистиеские данные
@@ -218,6 +319,8 @@ class Statistics():
         self.vacancies = vacancies
         self.profession_name = profession_name
         self.suitable_cities = []
+        self.aggregate = VacanciesAggregate(profession_name)
+        self.aggregate.add_vacancies(vacancies)
         self.share_of_cities = self.make_share_of_cities()
         self.salary_by_years = self.make_salary_by_years()
         self.quantity_by_years = self.make_quantity_by_years()
@@ -225,19 +328,23 @@ class Statistics():
         self.quantity_by_profession = self.make_quantity_by_profession()
         self.salary_by_cities = self.make_salary_by_sities()
 
+    def __getstate__(self):
+        """ При передаче в другой процесс копируются только итоговые данные, без списка вакансий
+
+        :return: Словарь полей класса без vacancies
+        """
+        state = self.__dict__.copy()
+        state["vacancies"] = []
+        return state
+
     def make_salary_by_years(self):
         """ Формирует статистику зарплат по годам
 
         :return: Словарь средних зарплат, где ключи - года
         """
         salary_by_years = {}
-        for vacancie in self.vacancies:
-            vacancie_year = int(datetime.datetime.strptime(vacancie.published_at, "%Y-%m-%dT%H:%M:%S%z").strftime("%Y"))
-            if vacancie_year not in salary_by_years.keys():
-                salary_by_years[vacancie_year] = []
-            salary_by_years[vacancie_year].append(vacancie.get_ru_salary())
-        for year in salary_by_years.keys():
-            salary_by_years[year] = int(mean(salary_by_years[year]))
+        for year, (salary_sum, count) in self.aggregate.by_years.items():
+            salary_by_years[year] = int(salary_sum / count)
         salary_by_years = dict(sorted(salary_by_years.items(), key=lambda x: x[0]))
         return salary_by_years
 
@@ -247,11 +354,8 @@ class Statistics():
         :return: Словарь количества вакансий, где ключи - года
         """
         quantity_by_years = {}
-        for vacancie in self.vacancies:
-            vacancie_year = int(datetime.datetime.strptime(vacancie.published_at, "%Y-%m-%dT%H:%M:%S%z").strftime("%Y"))
-            if vacancie_year not in quantity_by_years.keys():
-                quantity_by_years[vacancie_year] = 0
-            quantity_by_years[vacancie_year] += 1
+        for year, (salary_sum, count) in self.aggregate.by_years.items():
+            quantity_by_years[year] = count
         quantity_by_years = dict(sorted(quantity_by_years.items(), key=lambda x: x[0]))
         return quantity_by_years
 
@@ -261,15 +365,8 @@ class Statistics():
         :return: Словарь средних зарплат данной профессии, где ключи - года
         """
         salary_by_years = {}
-        for vacancie in self.vacancies:
-            if self.profession_name not in vacancie.name:
-                continue
-            vacancie_year = int(datetime.datetime.strptime(vacancie.published_at, "%Y-%m-%dT%H:%M:%S%z").strftime("%Y"))
-            if vacancie_year not in salary_by_years.keys():
-                salary_by_years[vacancie_year] = []
-            salary_by_years[vacancie_year].append(vacancie.get_ru_salary())
-        for year in salary_by_years.keys():
-            salary_by_years[year] = int(mean(salary_by_years[year]))
+        for year, (salary_sum, count) in self.aggregate.by_profession.items():
+            salary_by_years[year] = int(salary_sum / count)
         salary_by_years = dict(sorted(salary_by_years.items(), key=lambda x: x[0]))
         if len(salary_by_years.keys()) == 0:
             salary_by_years[2022] = 0
@@ -281,13 +378,8 @@ class Statistics():
         :return: Словарь количества вакансий выбранной профессии по годам
         """
         quantity_by_years = {}
-        for vacancie in self.vacancies:
-            if self.profession_name not in vacancie.name:
-                continue
-            vacancie_year = int(datetime.datetime.strptime(vacancie.published_at, "%Y-%m-%dT%H:%M:%S%z").strftime("%Y"))
-            if vacancie_year not in quantity_by_years.keys():
-                quantity_by_years[vacancie_year] = 0
-            quantity_by_years[vacancie_year] += 1
+        for year, (salary_sum, count) in self.aggregate.by_profession.items():
+            quantity_by_years[year] = count
         quantity_by_years = dict(sorted(quantity_by_years.items(), key=lambda x: x[0]))
         if len(quantity_by_years.keys()) == 0:
             quantity_by_years[2022] = 0
@@ -299,15 +391,9 @@ class Statistics():
         :return: Словарь средних зарплат по городам
         """
         salary_by_cities = {}
-        for vacancie in self.vacancies:
-            if vacancie.area_name not in self.suitable_cities:
-                continue
-            vacancie_city = vacancie.area_name
-            if vacancie_city not in salary_by_cities.keys():
-                salary_by_cities[vacancie_city] = []
-            salary_by_cities[vacancie_city].append(vacancie.get_ru_salary())
-        for area_name in salary_by_cities.keys():
-            salary_by_cities[area_name] = int(mean(salary_by_cities[area_name]))
+        for area_name in self.suitable_cities:
+            salary_sum, count = self.aggregate.by_cities[area_name]
+            salary_by_cities[area_name] = int(salary_sum / count)
         salary_by_cities = sorted(salary_by_cities.items(), key=lambda x: x[1], reverse=True)
         salary_by_cities = dict(salary_by_cities[:min(10,len(salary_by_cities))])
         return salary_by_cities
@@ -317,14 +403,11 @@ class Statistics():
 
         :return: Словарь процентов вакансий городов, доля которых больше 1%
         """
-        vacancies_quantity = len(self.vacancies)
+        vacancies_quantity = self.aggregate.vacancies_count
         share_of_cities = {}
         pop_names= []
-        for vacancie in self.vacancies:
-            vacancie_city = vacancie.area_name
-            if vacancie_city not in share_of_cities.keys():
-                share_of_cities[vacancie_city] = 0
-            share_of_cities[vacancie_city] += 1
+        for area_name, (salary_sum, count) in self.aggregate.by_cities.items():
+            share_of_cities[area_name] = count
 
         for area_name in share_of_cities.keys():
             share_of_cities[area_name] = round(share_of_cities[area_name]/vacancies_quantity,4)
@@ -349,35 +432,68 @@ class Plot:
     Attributes:
         statistic (Statistics): Класс статистики со всеми обработанными данными
         fig, axs: Поля класса plot библиотеки matplotlib
+        pyplot (bool): Создана ли фигура через pyplot (только для показа окна)
     """
-    def __init__(self, statistic):
-        """ Инициализирует класс Plot, и создаёт все нужные графики
+    def __init__(self, statistic, file_name="graph.png", show=False):
+        """ Инициализирует класс Plot, создаёт все нужные графики и сохраняет их в файл.
+        Без show фигура рисуется через Agg без pyplot, поэтому не зависит от графического интерфейса
+        и общего состояния pyplot, и несколько графиков можно рисовать в одном процессе или параллельно
 
         :param statistic: Класс подведённой статистики по данным
+        :param file_name: Имя файла для графиков, None - не сохранять в файл
+        :param show: Показывать ли окно с графиками (False для работы без графического интерфейса)
         """
         self.statistic = statistic
-        self.fig, self.axs = plt.subplots(2, 2, figsize=(20,9))
+        self.pyplot = show
+        if show:
+            from matplotlib import pyplot as plt
+            self.fig, self.axs = plt.subplots(2, 2, figsize=(20,9))
+        else:
+            from matplotlib.figure import Figure
+            from matplotlib.backends.backend_agg import FigureCanvasAgg
+            self.fig = Figure(figsize=(20,9))
+            FigureCanvasAgg(self.fig)
+            self.axs = self.fig.subplots(2, 2)
         self.create_salary_diagramm()
         self.create_years_diagramm()
         self.create_salary_by_cities_diagramm()
         self.create_share_of_cities_diagramm()
-        plt.savefig("graph.png")
-        plt.show()
+        if file_name is not None:
+            self.fig.savefig(file_name)
+        if show:
+            plt.show()
+
+    def to_bytes(self, format="png"):
+        """ Сохраняет графики в память
+
+        :param format: Формат изображения (png или svg)
+        :return: Байты изображения
+        """
+        buffer = io.BytesIO()
+        self.fig.savefig(buffer, format=format)
+        return buffer.getvalue()
+
+    def close(self):
+        """ Освобождает фигуру matplotlib
+        """
+        if self.pyplot:
+            from matplotlib import pyplot as plt
+            plt.close(self.fig)
 
     def create_salary_diagramm(self):
         """ Создаёт диаграмму зарплат по годам
         """
-        horizontal_labels = list(statistic.salary_by_years.keys())
-        horizontal_by_year = list(map(lambda x: x+0.2, list(statistic.salary_by_years.keys())))
-        vertical_by_year = list(statistic.salary_by_years.values())
+        horizontal_labels = list(self.statistic.salary_by_years.keys())
+        horizontal_by_year = list(map(lambda x: x+0.2, list(self.statistic.salary_by_years.keys())))
+        vertical_by_year = list(self.statistic.salary_by_years.values())
 
-        horizontal_by_profession = list(map(lambda x: x-0.2, list(statistic.salary_by_profession.keys())))
-        vertical_by_profession = list(statistic.salary_by_profession.values())
+        horizontal_by_profession = list(map(lambda x: x-0.2, list(self.statistic.salary_by_profession.keys())))
+        vertical_by_profession = list(self.statistic.salary_by_profession.values())
 
         self.axs[0, 0].bar(horizontal_by_year, vertical_by_year, label="средняя з/п", width=0.4)
-        self.axs[0, 0].bar(horizontal_by_profession, vertical_by_profession, label="з/п {}".format(statistic.profession_name), width=0.4)
+        self.axs[0, 0].bar(horizontal_by_profession, vertical_by_profession, label="з/п {}".format(self.statistic.profession_name), width=0.4)
         self.axs[0, 0].set_xticks(ticks=horizontal_labels, labels=horizontal_labels, rotation=90, fontsize=8)
-        plt.tick_params(labelsize=8)
+        self.axs[1, 1].tick_params(labelsize=8)
         self.axs[0, 0].title.set_text("Уровень зарплат по годам")
         self.axs[0, 0].legend(fontsize=8, loc='upper left')
         self.axs[0, 0].grid(axis='y')
@@ -385,15 +501,15 @@ class Plot:
     def create_years_diagramm(self):
         """ Создаёт диаграмму статистики количества вакансий в разные годы
         """
-        horizontal_labels = list(statistic.quantity_by_years.keys())
-        horisontal_by_year = list(map(lambda x: x+0.2, list(statistic.quantity_by_years.keys())))
-        vertical_by_year = list(statistic.quantity_by_years.values())
+        horizontal_labels = list(self.statistic.quantity_by_years.keys())
+        horisontal_by_year = list(map(lambda x: x+0.2, list(self.statistic.quantity_by_years.keys())))
+        vertical_by_year = list(self.statistic.quantity_by_years.values())
 
-        horisontal_by_profession = list(map(lambda x: x - 0.2, list(statistic.quantity_by_years.keys())))
-        vertical_by_profession = list(statistic.quantity_by_profession.values())
+        horisontal_by_profession = list(map(lambda x: x - 0.2, list(self.statistic.quantity_by_years.keys())))
+        vertical_by_profession = list(self.statistic.quantity_by_profession.values())
 
         self.axs[0, 1].bar(horisontal_by_year, vertical_by_year, label="Количество вакансий", width=0.4)
-        self.axs[0, 1].bar(horisontal_by_profession, vertical_by_profession, label="Количество вакансий {}".format(statistic.profession_name), width=0.4)
+        self.axs[0, 1].bar(horisontal_by_profession, vertical_by_profession, label="Количество вакансий {}".format(self.statistic.profession_name), width=0.4)
         self.axs[0, 1].set_xticks(ticks=horizontal_labels, labels=horizontal_labels, rotation=90, fontsize=8)
         self.axs[0, 1].title.set_text("Количество вакансий по годам")
         self.axs[0, 1].legend(fontsize=8, loc='upper left')
@@ -403,8 +519,8 @@ class Plot:
         """ Создаёт диаграмму статистики зарплат по городам
 
         """
-        horisontal = list(statistic.salary_by_cities.keys())
-        vertical = list(statistic.salary_by_cities.values())
+        horisontal = list(self.statistic.salary_by_cities.keys())
+        vertical = list(self.statistic.salary_by_cities.values())
         horisontal = list(map(lambda x: x.replace("-", "-\n").replace(" ", "\n"), horisontal))
 
         self.axs[1, 0].barh(horisontal, vertical)
@@ -412,24 +528,28 @@ class Plot:
         self.axs[1, 0].title.set_text("Уровень зарплат по городам")
 
     def create_share_of_cities_diagramm(self):
-        cities = list(statistic.share_of_cities.keys())
-        shares = list(statistic.share_of_cities.values())
+        cities = list(self.statistic.share_of_cities.keys())
+        shares = list(self.statistic.share_of_cities.values())
 
         self.axs[1, 1].title.set_text("Доля вакансий по городам")
         self.axs[1,1].pie(shares, labels=cities, textprops={'fontsize': 6})
 
 class XlTable():
-    """Класс, формирующий Excel таблицу по полученным из файла данным
+    """Класс, формирующий Excel таблицу по полученным из файла данным в потоковом (write-only) режиме openpyxl
 
     Attributes:
         wb (Workbook): Excel книга
         sheet_by_years (sheet) : Лист Excel таблицы, отвечающий за статистику по годам
         sheet_by_cities (sheet) : Лист Excel таблицы, отвечающий за статистику по городам
         thin_border (Border) : Тонкая граница ячеек графика
+        width_sample (int) : Количество первых строк листа вакансий, по которым считается ширина столбцов
     """
+    width_sample = 1000
+
     def __init__(self):
-        self.wb = Workbook()
-        del self.wb['Sheet']
+        from openpyxl import Workbook
+        from openpyxl.styles import Border, Side
+        self.wb = Workbook(write_only=True)
         self.sheet_by_years = self.wb.create_sheet("Статистика по годам")
         self.sheet_by_cities = self.wb.create_sheet("Статистика по городам")
         self.thin_border = Border(left=Side(style='thin'),
@@ -437,21 +557,46 @@ class XlTable():
                              top=Side(style='thin'),
                              bottom=Side(style='thin'))
 
-    def set_cell_width(self, sheet):
-        """Устанавливает для листа ширину столбцов по длине наибольшей строки столбца
+    def make_cell(self, sheet, value, border=True, bold=False, alignment=None, number_format=None):
+        """ Создаёт ячейку для потоковой записи с нужным оформлением
 
-        :param sheet: Лист на котором устанавливается ширина столбца
+        :param sheet: Лист, в который будет записана ячейка
+        :param value: Значение ячейки
+        :return: Ячейка WriteOnlyCell
         """
-        column_widths = []
-        for row in sheet.rows:
-            for i, cell in enumerate(row):
-                cellv = str(cell.value)
-                if len(column_widths) > i:
-                    if len(cellv) > column_widths[i]:
-                        column_widths[i] = len(cellv)
-                else:
-                    column_widths += [len(cellv)]
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.styles import Font, Alignment
+        cell = WriteOnlyCell(sheet, value=value)
+        if border:
+            cell.border = self.thin_border
+        if bold:
+            cell.font = Font(bold=True)
+        if alignment is not None:
+            cell.alignment = Alignment(horizontal=alignment)
+        if number_format is not None:
+            cell.number_format = number_format
+        return cell
 
+    def update_widths(self, column_widths, row):
+        """Обновляет ширину столбцов по длине значений очередной строки
+
+        :param column_widths: Лист текущих ширин столбцов
+        :param row: Лист значений строки
+        """
+        for i, value in enumerate(row):
+            width = len(str(value)) if value is not None else 0
+            if len(column_widths) > i:
+                column_widths[i] = max(column_widths[i], width)
+            else:
+                column_widths.append(width)
+
+    def set_cell_width(self, sheet, column_widths):
+        """Устанавливает для листа ширину столбцов; в write-only режиме это нужно сделать до записи первой строки
+
+        :param sheet: Лист на котором устанавливается ширина столбца
+        :param column_widths: Длины наибольших строк столбцов
+        """
+        from openpyxl.utils import get_column_letter
         for i, column_width in enumerate(column_widths, 1):  # ,1 to start at 1
             sheet.column_dimensions[get_column_letter(i)].width = column_width +3
 
@@ -461,49 +606,31 @@ class XlTable():
         :param statistic (Statistic) : класс Statictic, со всеми данными из файла
         """
         headers = ["Город", "Уровень зарплат", "", "Город", "Доля вакансий"]
-        thin_border = Border(left=Side(style='thin'),
-                             right=Side(style='thin'),
-                             top=Side(style='thin'),
-                             bottom=Side(style='thin'))
-        self.sheet_by_cities.append(headers)
-        headers_cells = [self.sheet_by_cities["A1"],self.sheet_by_cities["B1"],
-                         self.sheet_by_cities["D1"],self.sheet_by_cities["E1"]]
-        for cell in headers_cells:
-            cell.border = thin_border
-            cell.font = Font(bold=True)
-
-        self.sheet_by_cities.append(headers)
-        city_index = 0
-        value_index = 0
-        city_values = statistic.salary_by_cities
-        for row in self.sheet_by_cities.iter_rows(max_row=len(city_values)+1, min_row=2, min_col=1, max_col=2):
-            for cell in row:
-                if cell.column == 1:
-                    cell.value = list(statistic.salary_by_cities.keys())[city_index]
-                    city_index+=1
-                else:
-                    cell.value = list(statistic.salary_by_cities.values())[value_index]
-                    value_index+=1
-                cell.border = self.thin_border
-
-        city_index = 0
-        value_index = 0
-        city_values = statistic.share_of_cities
-        for row in self.sheet_by_cities.iter_rows(max_row=len(city_values)+1, min_row=2, min_col=4, max_col=5):
-            for cell in row:
-                if cell.column == 4:
-                    cell.value = list(statistic.share_of_cities.keys())[city_index]
-                    city_index+=1
-                else:
-                    cell.number_format = "0.00%"
-                    cell.value = list(statistic.share_of_cities.values())[value_index]
-                    value_index+=1
-                cell.border = self.thin_border
+        salary_by_cities = list(statistic.salary_by_cities.items())
+        share_of_cities = list(statistic.share_of_cities.items())
+        rows = []
+        for index in range(max(len(salary_by_cities), len(share_of_cities))):
+            salary_city, salary = salary_by_cities[index] if index < len(salary_by_cities) else (None, None)
+            share_city, share = share_of_cities[index] if index < len(share_of_cities) else (None, None)
+            rows.append([salary_city, salary, None, share_city, share])
 
-
-        self.set_cell_width(self.sheet_by_cities)
-
-        self.wb.save("report.xlsx")
+        column_widths = []
+        for row in [headers] + rows:
+            self.update_widths(column_widths, row)
+        self.set_cell_width(self.sheet_by_cities, column_widths)
+
+        sheet = self.sheet_by_cities
+        self.sheet_by_cities.append([self.make_cell(sheet, header, border=bool(header), bold=bool(header))
+                                     for header in headers])
+        for index, row in enumerate(rows):
+            cells = [None] * 5
+            if index < len(salary_by_cities):
+                cells[0] = self.make_cell(sheet, row[0])
+                cells[1] = self.make_cell(sheet, row[1])
+            if index < len(share_of_cities):
+                cells[3] = self.make_cell(sheet, row[3])
+                cells[4] = self.make_cell(sheet, row[4], number_format="0.00%")
+            self.sheet_by_cities.append(cells)
 
     def make_sheet_by_years(self, statistic):
         """ Создаёт лист excel с данными из файла по годам
@@ -512,56 +639,298 @@ class XlTable():
         """
         headers = ["Год", "Средняя зарплата", "Средняя зарплата - {}".format(statistic.profession_name),
                    "Количество вакансий", "Количество вакансий - {}".format(statistic.profession_name)]
-
-        self.sheet_by_years.append(headers)
+        rows = []
         for year in statistic.salary_by_years.keys():
-            row = [year]
-            mean_salary = statistic.salary_by_years[year]
-            mean_profession_salary = statistic.salary_by_profession[year]
-            vacancies_quantity = statistic.quantity_by_years[year]
-            vacancies_profession_quantity = statistic.quantity_by_profession[year]
-            row = row + [mean_salary, mean_profession_salary, vacancies_quantity, vacancies_profession_quantity]
-            self.sheet_by_years.append(row)
+            rows.append([year, statistic.salary_by_years[year], statistic.salary_by_profession.get(year, 0),
+                         statistic.quantity_by_years[year], statistic.quantity_by_profession.get(year, 0)])
 
-        for row in self.sheet_by_years.iter_rows(max_col=5, max_row=1):
-            for cell in row:
-                cell.font = Font(bold=True)
-                cell.alignment = Alignment(horizontal="left")
+        column_widths = []
+        for row in [headers] + rows:
+            self.update_widths(column_widths, row)
+        self.set_cell_width(self.sheet_by_years, column_widths)
+
+        sheet = self.sheet_by_years
+        self.sheet_by_years.append([self.make_cell(sheet, header, bold=True, alignment="left") for header in headers])
+        for row in rows:
+            self.sheet_by_years.append([self.make_cell(sheet, value) for value in row])
+
+    def make_sheet_by_vacancies(self, profession_name, vacancies):
+        """ Создаёт лист excel со всеми вакансиями выбранной профессии.
+        Строки пишутся потоком, поэтому память не зависит от количества вакансий;
+        ширина столбцов считается по первым width_sample строкам. Символы []:*?/\\, недопустимые в названии листа,
+        заменяются пробелами
+
+        :param profession_name (str) : Название профессии
+        :param vacancies : Итерируемый объект кортежей (название, от, до, валюта, город, дата, зарплата в рублях)
+        """
+        title = re.sub(r"[\[\]:*?/\\]", " ", "Вакансии - {}".format(profession_name))[:31]
+        sheet = self.wb.create_sheet(title)
+        headers = ["Название", "Оклад от", "Оклад до", "Валюта", "Город", "Дата публикации", "Средний оклад в рублях"]
+        vacancies = iter(vacancies)
+        sample = [headers]
+        for row in vacancies:
+            sample.append(row)
+            if len(sample) > self.width_sample:
+                break
 
-        for row in self.sheet_by_years.rows:
-            for cell in row:
-                cell.border = self.thin_border
+        column_widths = []
+        for row in sample:
+            self.update_widths(column_widths, row)
+        self.set_cell_width(sheet, column_widths)
 
-        self.set_cell_width(self.sheet_by_years)
-        self.wb.save("report.xlsx")
+        sheet.append([self.make_cell(sheet, header, border=False, bold=True) for header in headers])
+        for row in sample[1:]:
+            sheet.append(row)
+        for row in vacancies:
+            sheet.append(row)
 
+    def save(self, file_name="report.xlsx"):
+        """ Сохраняет книгу; в write-only режиме это можно сделать только один раз
+
+        :param file_name: Имя xlsx файла
+        """
+        self.wb.save(file_name)
+
+
+@functools.lru_cache(maxsize=None)
+def get_pdf_template(template_name="pdf_template.html"):
+    """ Загружает и компилирует шаблон pdf отчёта один раз на процесс
+
+    :param template_name: Имя файла шаблона
+    :return: Скомпилированный шаблон jinja2
+    """
+    from jinja2 import Environment, FileSystemLoader
+    env = Environment(loader=FileSystemLoader('.'))
+    return env.get_template(template_name)
 
-def generate_pdf(prof, statistic):
-    """ Формирует pdf файл по заранее созданному шаблону, объединяющему все данные по вакансиям
+
+@functools.lru_cache(maxsize=None)
+def get_pdfkit_config():
+    """ Создаёт конфигурацию pdfkit один раз на процесс
+
+    :return: Конфигурация pdfkit с путём к wkhtmltopdf
+    """
+    import pdfkit
+    return pdfkit.configuration(wkhtmltopdf=r'C:\Program Files\wkhtmltopdf\bin\wkhtmltopdf.exe')
+
+
+def make_pdf_section(prof, statistic, graph=None):
+    """ Подготавливает данные одной профессии для шаблона pdf отчёта
 
     :param prof: Выбранная профессия
     :param statistic: класс Statictic, со всеми данными из файла
+    :param graph: Байты png с графиками; если не переданы, графики рисуются заново в памяти
+    :return: Словарь переменных раздела шаблона, графики встроены в него как data URI
     """
+    if graph is None:
+        graph = render_chart(statistic)
     headers1 = ["Год", "Средняя зарплата", f"Средняя зарплата - {prof}", "Количество вакансий",
                     f"Количество вакансий - {prof}"]
     headers2 = ["Город", "Уровень зарплат", "Город", "Доля вакансий"]
+    return {'profession': prof,
+            "graph": "data:image/png;base64," + base64.b64encode(graph).decode(),
+            "headers1": headers1,
+            "headers2": headers2,
+            "salary_by_years": statistic.salary_by_years,
+            "vacancies_by_years": statistic.salary_by_profession,
+            "vacancies_salary_by_years": statistic.quantity_by_years,
+            "vacancies_counts_by_years": statistic.quantity_by_profession,
+            "salary_by_cities": statistic.salary_by_cities,
+            "vacs_by_cities": statistic.share_of_cities
+            }
+
+
+def write_pdf(sections, file_name):
+    """ Формирует pdf файл из одного или нескольких разделов по скомпилированному шаблону
+
+    :param sections: Лист словарей разделов, полученных из make_pdf_section
+    :param file_name: Имя pdf файла
+    """
+    import pdfkit
+    pdf_template = get_pdf_template().render({"reports": sections})
+    pdfkit.from_string(pdf_template, file_name, configuration=get_pdfkit_config(),
+                       options={"enable-local-file-access": None})
+
+
+def generate_pdf(prof, statistic, graph=None, file_name="report.pdf"):
+    """ Формирует pdf файл по заранее созданному шаблону, объединяющему все данные по вакансиям
+
+    :param prof: Выбранная профессия
+    :param statistic: класс Statictic, со всеми данными из файла
+    :param graph: Байты png с графиками; если не переданы, графики рисуются заново в памяти
+    :param file_name: Имя pdf файла
+    """
+    write_pdf([make_pdf_section(prof, statistic, graph)], file_name)
+
+
+def render_pdf_section(statistic):
+    """ Рисует графики и готовит раздел pdf отчёта в процессе пула
+
+    :param statistic: класс Statictic, со всеми данными из файла
+    :return: Словарь переменных раздела шаблона
+    """
+    return make_pdf_section(statistic.profession_name, statistic)
+
+
+def render_profession_pdf(statistic, file_name):
+    """ Формирует pdf отчёт одной профессии в процессе пула
+
+    :param statistic: класс Statictic, со всеми данными из файла
+    :param file_name: Имя pdf файла
+    :return: Имя сформированного файла
+    """
+    write_pdf([render_pdf_section(statistic)], file_name)
+    return file_name
+
+
+def generate_pdf_batch(statistics, folder="reports", workers=4, single_file=False):
+    """ Формирует pdf отчёты для многих профессий. Шаблон компилируется один раз в каждом процессе,
+    графики передаются в шаблон в памяти. Отчёты формируются ограниченным пулом процессов,
+    либо, при single_file, разделы готовятся параллельно и собираются в один документ одним запуском wkhtmltopdf
+
+    :param statistics: Лист классов Statistics для разных профессий
+    :param folder: Папка для pdf файлов
+    :param workers: Количество процессов
+    :param single_file: Собирать ли все профессии в один report.pdf
+    :return: Кортеж (имена сформированных файлов, количество отчётов в минуту)
+    """
+    os.makedirs(folder, exist_ok=True)
+    start = time.perf_counter()
+    with concurrent.futures.ProcessPoolExecutor(workers) as pool:
+        if single_file:
+            file_names = [os.path.join(folder, "report.pdf")]
+            write_pdf(list(pool.map(render_pdf_section, statistics)), file_names[0])
+        else:
+            file_names = [os.path.join(folder, "report_{}.pdf".format(index)) for index in range(len(statistics))]
+            file_names = list(pool.map(render_profession_pdf, statistics, file_names))
+    elapsed = time.perf_counter() - start
+    return file_names, len(statistics) * 60 / elapsed
+
+def render_chart(statistic, format="png"):
+    """ Рисует графики без графического окна и возвращает их в памяти
+
+    :param statistic: класс Statictic, со всеми данными из файла
+    :param format: Формат изображения (png или svg)
+    :return: Байты изображения
+    """
+    plot = Plot(statistic, file_name=None)
+    try:
+        return plot.to_bytes(format)
+    finally:
+        plot.close()
+
+
+def render_charts(statistics, format="png", workers=4):
+    """ Параллельно рисует графики для многих профессий в пуле процессов
+
+    :param statistics: Лист классов Statistics для разных профессий
+    :param format: Формат изображений (png или svg)
+    :param workers: Количество процессов
+    :return: Лист байтов изображений в порядке statistics
+    """
+    with concurrent.futures.ProcessPoolExecutor(workers) as pool:
+        return list(pool.map(render_chart, statistics, [format] * len(statistics)))
+
+
+def render_graph(statistic):
+    """ Рисует graph.png без графического окна
+
+    :param statistic: класс Statictic, со всеми данными из файла
+    """
+    Plot(statistic).close()
+
+
+def render_table(statistic, vacancies_file=None):
+    """ Формирует report.xlsx
+
+    :param statistic: класс Statictic, со всеми данными из файла
+    :param vacancies_file: Имя csv файла, вакансии выбранной профессии из которого выводятся на отдельный лист;
+        None - без него
+    """
+    table = XlTable()
+    table.make_sheet_by_years(statistic)
+    table.make_sheet_by_cities(statistic)
+    if vacancies_file is not None:
+        table.make_sheet_by_vacancies(statistic.profession_name,
+                                      iter_vacancy_rows(vacancies_file, statistic.profession_name))
+    table.save()
+
+
+def render_pdf(statistic):
+    """ Формирует report.pdf, рисуя графики для него в памяти
+
+    :param statistic: класс Statictic, со всеми данными из файла
+    """
+    generate_pdf(statistic.profession_name, statistic)
+
+
+def iter_vacancy_rows(file_name, profession_name):
+    """ Построчно читает csv файл и отдаёт вакансии выбранной профессии для листа вакансий excel таблицы.
+    Строки очищаются так же, как в DataSet.csv_filer, но в памяти одновременно находится только одна строка,
+    поэтому лист формируется в процессе пула без передачи списка вакансий между процессами
+
+    :param file_name: Имя csv файла
+    :param profession_name: Название профессии
+    :return: Генератор кортежей (название, от, до, валюта, город, дата, зарплата в рублях)
+    """
+    data_set = DataSet(file_name)
+    with open(file_name, "r", encoding='utf_8_sig') as csv_file:
+        reader = csv.reader(csv_file)
+        first_line = next(reader, [])
+        clears = [data_set.clear_plain if skill in data_set.plain_columns else data_set.clear_text
+                  for skill in first_line]
+        get_fields = operator.itemgetter(*Vacancy.fields)
+        for row in reader:
+            if not data_set.check_list(row, len(first_line)):
+                continue
+            vacancy = Vacancy(*get_fields(dict(zip(first_line, [clear(value) for clear, value in zip(clears, row)]))))
+            if profession_name in vacancy.name:
+                yield (vacancy.name, vacancy.salary_from, vacancy.salary_to, vacancy.salary_currency,
+                       vacancy.area_name, vacancy.published_at, vacancy.ru_salary)
+
+
+def generate_reports(statistic, workers=3, details=None):
+    """ Параллельно формирует graph.png, report.xlsx и report.pdf в пуле процессов
+
+    :param statistic: класс Statictic, со всеми данными из файла
+    :param workers: Количество процессов
+    :param details: Имя csv файла, все вакансии выбранной профессии из которого добавляются в report.xlsx
+        отдельным листом; None - без листа. Файл читается потоком в процессе, который пишет таблицу
+    :return: Словарь времени формирования каждого файла в секундах; подробности по процессам
+        добавляются к текущему этапу отчёта instrumentation
+    """
+    artifacts = {"graph.png": render_graph,
+                 "report.xlsx": functools.partial(render_table, vacancies_file=details),
+                 "report.pdf": render_pdf}
+    with concurrent.futures.ProcessPoolExecutor(workers) as pool:
+        futures = {name: pool.submit(instrumentation.call_timed, function, statistic)
+                   for name, function in artifacts.items()}
+        workers = [dict(future.result()[1], label=name) for name, future in futures.items()]
+    if instrumentation.active_report is not None:
+        instrumentation.active_report.add_workers(workers)
+    return {worker["label"]: worker["seconds"] for worker in workers}
+
+
+def make_statistic(file_name, profession_name):
+    """ Читает файл, очищает данные и подводит статистику; этапы записываются в активный отчёт instrumentation
+
+    :param file_name: Имя csv файла
+    :param profession_name: Название профессии
+    :return: Класс Statistics, None если файл пуст
+    """
+    data_set = DataSet(file_name)
+    with instrumentation.stage("read") as record:
+        f_line, vacancies, empty = data_set.csv_reader(file_name)
+        record["rows"] = len(vacancies)
+    if empty:
+        return None
+    with instrumentation.stage("clean", len(vacancies)):
+        data = data_set.csv_filer(f_line, vacancies)
+    with instrumentation.stage("objects", len(data)):
+        data_set.vacancies_objects = set_class_values(data)
+    with instrumentation.stage("statistics", len(data)):
+        return Statistics(data_set.vacancies_objects, profession_name)
 
-    env = Environment(loader=FileSystemLoader('.'))
-    template = env.get_template("pdf_template.html")
-
-    pdf_template = template.render({'profession': prof,
-                                        "headers1": headers1,
-                                        "headers2": headers2,
-                                        "salary_by_years": statistic.salary_by_years,
-                                        "vacancies_by_years": statistic.salary_by_profession,
-                                        "vacancies_salary_by_years": statistic.quantity_by_years,
-                                        "vacancies_counts_by_years": statistic.quantity_by_profession,
-                                        "salary_by_cities": statistic.salary_by_cities,
-                                        "vacs_by_cities": statistic.share_of_cities
-                                        })
-
-    config = pdfkit.configuration(wkhtmltopdf=r'C:\Program Files\wkhtmltopdf\bin\wkhtmltopdf.exe')
-    pdfkit.from_string(pdf_template, 'report.pdf', configuration=config, options={"enable-local-file-access": None})
 
 class ProjectTests(TestCase):
     def test_dataset_file_name(self):
@@ -599,6 +968,37 @@ class ProjectTests(TestCase):
     def test_dataset_clear_list_4_test(self):
         self.assertEqual(DataSet("vacancies_by_year.csv").clear_list("<html><b><br></b></html>"), '')
 
+    def test_dataset_csv_filer_matches_clear_list(self):
+        data_set = DataSet("vacancies_by_year.csv")
+        reader = ['name', 'salary_from', 'salary_to', 'salary_currency', 'area_name', 'published_at']
+        list_naming = [
+            ["<b>Программист</b> <i>Python</i>", "10000.0", "20000.0", "RUR", "Москва", "2022-07-05T18:19:30+0300"],
+            ["  Аналитик\n\tданных  ", " 100 000 ", "<b>200</b>", "<p>EUR</p>", "Санкт- Петербург", "2022\t07"],
+            ["1С<br>разработчик", "1 000", "２０００", " USD", "<span> Казань </span>", "2021-01-01T00:00:00+0300"],
+            ["x<y", "a<b>c", "​5", "KZT\r\n", "<>", "<!--2021-->"],
+        ]
+        expected = [{key: " ".join(data_set.clear_list(value).split()) for key, value in zip(reader, row)}
+                    for row in list_naming]
+        self.assertEqual(data_set.csv_filer(reader, list_naming), expected)
+
+    def test_vacancy_ru_salary(self):
+        self.assertEqual(Vacancy("Программист", "10000.0", "20000.0", "EUR", "Москва",
+                                 "2022-07-05T18:19:30+0300").get_ru_salary(), 898500.0)
+
+    def build_statistics(self, quantity):
+        vacancies = [Vacancy("Программист", "10000.0", "20000.0", "RUR", "Москва", "2022-07-05T18:19:30+0300")
+                     for _ in range(quantity)]
+        return Statistics(vacancies, "Программист")
+
+    def test_statistics_memory_budget(self):
+        with instrumentation.memory_budget(3):
+            self.build_statistics(10000)
+
+    def test_statistics_memory_budget_exceeded(self):
+        with self.assertRaises(instrumentation.MemoryBudgetExceeded):
+            with instrumentation.memory_budget(0.5):
+                self.build_statistics(10000)
+
     def test_inputcorrect_get_key_one_value(self):
         self.assertEqual(InputCorrect().get_key({"Аня": 15, "Вова": 31, "Маша": 44}, 44), 'Маша')
 
@@ -612,31 +1012,28 @@ def set_class_values(data):
     :param data list(dict): Данные, полученные из csv файла
     :return list(Vacancie) : Лист класса Vacancie, созданный из листа словарей
     """
-    vacancies = []
-    for dic in data:
-        vacancy = Vacancy()
-        for value in dic.items():
-            setattr(vacancy, value[0], value[1])
-        vacancies.append(vacancy)
-    return vacancies
-
-doctest.testmod()
-
-input_rows = InputCorrect()
-data_set = DataSet(input_rows.file_name)
-f_line, vacancies, empty = data_set.csv_reader(input_rows.file_name)
-if not empty:
-    data = data_set.csv_filer(f_line, vacancies)
-    data_set.vacancies_objects = set_class_values(data)
-    statistic = Statistics(data_set.vacancies_objects, input_rows.profession_name)
-    print("{}: {}".format("Динамика уровня зарплат по годам", statistic.salary_by_years))
-    print("{}: {}".format("Динамика количества вакансий по годам", statistic.quantity_by_years))
-    print("{}: {}".format("Динамика уровня зарплат по годам для выбранной профессии", statistic.salary_by_profession))
-    print("{}: {}".format("Динамика количества вакансий по годам для выбранной профессии",
-                          statistic.quantity_by_profession))
-    print("{}: {}".format("Уровень зарплат по городам (в порядке убывания)", statistic.salary_by_cities))
-    print("{}: {}".format("Доля вакансий по городам (в порядке убывания)", statistic.share_of_cities))
-    generate_pdf(statistic.profession_name, statistic)
-    pl = Plot(statistic)
+    get_fields = operator.itemgetter(*Vacancy.fields)
+    return [Vacancy(*get_fields(dic)) for dic in data]
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
+
+    input_rows = InputCorrect()
+    with instrumentation.run("Task2-3") as run_report:
+        statistic = make_statistic(input_rows.file_name, input_rows.profession_name)
+        if statistic is not None:
+            with run_report.stage("reports"):
+                report_times = generate_reports(statistic)
+    if statistic is not None:
+        print("{}: {}".format("Динамика уровня зарплат по годам", statistic.salary_by_years))
+        print("{}: {}".format("Динамика количества вакансий по годам", statistic.quantity_by_years))
+        print("{}: {}".format("Динамика уровня зарплат по годам для выбранной профессии", statistic.salary_by_profession))
+        print("{}: {}".format("Динамика количества вакансий по годам для выбранной профессии",
+                              statistic.quantity_by_profession))
+        print("{}: {}".format("Уровень зарплат по городам (в порядке убывания)", statistic.salary_by_cities))
+        print("{}: {}".format("Доля вакансий по городам (в порядке убывания)", statistic.share_of_cities))
+        for name, seconds in report_times.items():
+            print("{}: {:.2f} с".format(name, seconds))
 
 
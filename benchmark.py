@@ -0,0 +1,278 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import cli
+import instrumentation
+import vacancy_generator
+
+
+# Скрипты импортируются через ScriptFinder из cli, поэтому их функции передаются в процессы пулов по имени модуля
+task2_3, task3_2_1, task3_2_2, task3_2_3 = (cli.load_script(name) for name in cli.SCRIPTS)
+
+
+def get_result(report, quantity_by_years=None):
+    """ Формирует результат пути выполнения из отчёта instrumentation
+
+    :param report: instrumentation.RunReport пути
+    :param quantity_by_years: Количество вакансий по годам для сверки путей между собой
+    :return: Словарь этапов, общего времени и количества вакансий по годам
+    """
+    result = report.to_dict()
+    result["seconds"] = sum(record["seconds"] for record in report.stages.values())
+    result["quantity_by_years"] = {str(year): count for year, count in (quantity_by_years or {}).items()}
+    return result
+
+
+def run_task2_3(report, file_name, profession_name):
+    """ Однопроцессный путь Task2-3.py: чтение, очистка, объекты Vacancy, статистика, графики и таблица
+
+    :param report: instrumentation.RunReport пути
+    :return: Количество вакансий по годам
+    """
+    data_set = task2_3.DataSet(file_name)
+    with report.stage("read") as record:
+        first_line, vacancies, empty = data_set.csv_reader(file_name)
+        record["rows"] = len(vacancies)
+    with report.stage("clean") as record:
+        data = data_set.csv_filer(first_line, vacancies)
+        record["rows"] = len(data)
+    with report.stage("objects") as record:
+        vacancies_objects = task2_3.set_class_values(data)
+        record["rows"] = len(vacancies_objects)
+    with report.stage("statistics") as record:
+        statistic = task2_3.Statistics(vacancies_objects, profession_name)
+        record["rows"] = len(vacancies_objects)
+    with report.stage("chart"):
+        task2_3.render_chart(statistic)
+    with report.stage("xlsx"):
+        task2_3.render_table(statistic)
+    return statistic.quantity_by_years
+
+
+def run_task3_2_1(report, file_name, folder):
+    """ Разделение файла по годам Task3-2-1.py
+
+    :param report: instrumentation.RunReport пути
+    :return: None, разделение не считает статистику
+    """
+    with report.stage("split") as record:
+        record["rows"] = task3_2_1.csv_splitter(file_name, folder)
+    return None
+
+
+def run_task3_2_2(report, folder, profession_name):
+    """ Путь Task 3-2-2.py через multiprocessing.Pool по файлам годов
+
+    :param report: instrumentation.RunReport пути
+    :return: Количество вакансий по годам
+    """
+    multiple_reader = task3_2_2.MultipleReader.__new__(task3_2_2.MultipleReader)
+    multiple_reader.file_names = [os.path.join(folder, name) for name in sorted(os.listdir(folder))]
+    with report.stage("read") as record:
+        vacancies = multiple_reader.reader()
+        record["rows"] = sum(map(len, vacancies))
+    multiple_statistics = task3_2_2.MultipleStatistics(profession_name)
+    with report.stage("statistics") as record:
+        statistics = multiple_statistics.get_statistic(vacancies)
+        record["rows"] = sum(map(len, vacancies))
+    with report.stage("merge"):
+        multiple_statistics.merge_statistics(statistics)
+    return multiple_statistics.quantity_by_years
+
+
+def run_task3_2_3(report, folder, profession_name):
+    """ Путь 3-2-3.py через concurrent.futures по файлам годов: в памяти, по колонкам с пустым и заполненным кэшем
+
+    :param report: instrumentation.RunReport пути
+    :return: Количество вакансий по годам
+    """
+    multiple_reader = task3_2_3.MultipleReader(folder)
+    multiple_statistics = task3_2_3.MultipleStatistics(profession_name)
+    with report.stage("read") as record:
+        vacancies = list(multiple_reader.reader())
+        record["rows"] = sum(len(rows[1]) for rows in vacancies)
+    with report.stage("statistics") as record:
+        aggregates = multiple_statistics.get_statistic(vacancies)
+        record["rows"] = sum(len(rows[1]) for rows in vacancies)
+    with report.stage("merge"):
+        multiple_statistics.merge_statistics(aggregates)
+    shutil.rmtree(".vacancy_cache", ignore_errors=True)
+    with report.stage("table_cold"):
+        task3_2_3.MultipleStatistics(profession_name).collect(multiple_reader)
+    with report.stage("table_warm"):
+        task3_2_3.MultipleStatistics(profession_name).collect(multiple_reader)
+    return multiple_statistics.quantity_by_years
+
+
+def run_task3_2_3_byte_range(report, file_name, profession_name):
+    """ Путь 3-2-3.py по байтовым диапазонам одного большого файла
+
+    :param report: instrumentation.RunReport пути
+    :return: Количество вакансий по годам
+    """
+    with report.stage("aggregate") as record:
+        aggregate = task3_2_3.DataSet(file_name).aggregate(profession_name)
+        record["rows"] = aggregate.vacancies_count
+    return task3_2_3.Statistics.from_aggregate(aggregate).quantity_by_years
+
+
+def run_cli(report, file_name, profession_name, repeat=5):
+    """ Холодный запуск cli.py в отдельном процессе: только разбор аргументов, stats по файлу с заполненным кэшем
+    таблицы и, для сравнения, загрузка всех библиотек отчётов. Берётся лучшее время из repeat запусков
+
+    :param report: instrumentation.RunReport пути
+    :return: None, путь не считает статистику
+    """
+    commands = {"help": [sys.executable, os.path.join(cli.ROOT, "cli.py"), "--help"],
+                "stats": [sys.executable, os.path.join(cli.ROOT, "cli.py"), "stats", file_name, profession_name],
+                "report_imports": [sys.executable, "-c", "import matplotlib.pyplot, openpyxl, jinja2, pdfkit"]}
+    subprocess.run(commands["stats"], stdout=subprocess.DEVNULL, check=True)
+    for name, command in commands.items():
+        with report.stage(name) as record:
+            seconds = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                subprocess.run(command, stdout=subprocess.DEVNULL, check=True)
+                seconds.append(time.perf_counter() - start)
+            record["cold_start_seconds"] = min(seconds)
+    return None
+
+
+PATHS = ["task2_3", "task3_2_1", "task3_2_2", "task3_2_3", "task3_2_3_byte_range", "cli"]
+
+
+def run_path(path, file_name, folder, profession_name, profile=False, memory=False):
+    """ Запускает один путь выполнения на общих данных
+
+    :param path: Название пути из PATHS
+    :param profile: Снимать ли профиль cProfile
+    :param memory: Замерять ли память этапов и считать объекты Vacancy и dict
+    :return: Словарь этапов
+    """
+    with instrumentation.RunReport(path, profile=profile, memory=memory,
+                                   object_types=("Vacancy", "dict") if memory else ()) as report:
+        if path == "task2_3":
+            quantity_by_years = run_task2_3(report, file_name, profession_name)
+        elif path == "task3_2_1":
+            quantity_by_years = run_task3_2_1(report, file_name, folder)
+        elif path == "task3_2_2":
+            quantity_by_years = run_task3_2_2(report, folder, profession_name)
+        elif path == "task3_2_3":
+            quantity_by_years = run_task3_2_3(report, folder, profession_name)
+        elif path == "task3_2_3_byte_range":
+            quantity_by_years = run_task3_2_3_byte_range(report, file_name, profession_name)
+        else:
+            quantity_by_years = run_cli(report, file_name, profession_name)
+    return get_result(report, quantity_by_years)
+
+
+def best_run(runs):
+    """ Выбирает для каждого этапа лучшее время из нескольких повторов
+
+    :param runs: Лист результатов пути
+    :return: Результат пути с лучшими временами этапов и временами всех повторов
+    """
+    result = runs[0]
+    for name, record in result["stages"].items():
+        record["runs"] = [run["stages"][name]["seconds"] for run in runs]
+        best = min(runs, key=lambda run: run["stages"][name]["seconds"])["stages"][name]
+        record.update({key: value for key, value in best.items() if key != "runs"})
+    result["seconds"] = sum(record["seconds"] for record in result["stages"].values())
+    return result
+
+
+def run_benchmark(arguments):
+    """ Создаёт данные и замеряет все выбранные пути выполнения
+
+    :param arguments: Аргументы командной строки
+    :return: Словарь результатов для json
+    """
+    paths = arguments.paths or PATHS
+    if "task3_2_2" in paths or "task3_2_3" in paths:
+        paths = ["task3_2_1"] + [path for path in paths if path != "task3_2_1"]
+    work_folder = os.path.abspath(arguments.workdir or tempfile.mkdtemp(prefix="vacancy_benchmark_"))
+    os.makedirs(work_folder, exist_ok=True)
+    current_folder = os.getcwd()
+    os.chdir(work_folder)
+    try:
+        file_name = os.path.join(work_folder, "vacancies.csv")
+        folder = os.path.join(work_folder, "CSV_files")
+        start = time.perf_counter()
+        vacancy_generator.generate_from_arguments(file_name, arguments)
+        results = {"generate": {"seconds": time.perf_counter() - start}, "paths": {}}
+        for path in paths:
+            runs = []
+            for _ in range(arguments.repeat):
+                if path == "task3_2_1":
+                    shutil.rmtree(folder, ignore_errors=True)
+                runs.append(run_path(path, file_name, folder, arguments.profession, arguments.profile,
+                                     arguments.memory))
+            results["paths"][path] = best_run(runs)
+            print("{}: {:.2f} с".format(path, results["paths"][path]["seconds"]), file=sys.stderr)
+        results["data"] = {"rows": arguments.rows, "seed": arguments.seed, "years": list(arguments.years),
+                           "cities": arguments.cities, "city_skew": arguments.city_skew,
+                           "currencies": arguments.currencies or vacancy_generator.CURRENCIES,
+                           "html_share": arguments.html_share, "empty_share": arguments.empty_share,
+                           "sorted_dates": not arguments.unsorted, "profession": arguments.profession,
+                           "file_size": os.path.getsize(file_name)}
+    finally:
+        os.chdir(current_folder)
+        if not arguments.keep and arguments.workdir is None:
+            shutil.rmtree(work_folder, ignore_errors=True)
+    results["environment"] = {"date": datetime.datetime.now().isoformat(timespec="seconds"),
+                              "python": platform.python_version(), "platform": platform.platform(),
+                              "cpu_count": os.cpu_count(), "repeat": arguments.repeat}
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """ Сравнивает этапы с прошлым запуском
+
+    :param results: Текущие результаты
+    :param baseline: Результаты прошлого запуска
+    :param tolerance: Допустимая доля замедления, например 0.2
+    :return: Лист строк с описанием замедлившихся этапов
+    """
+    regressions = []
+    for path, result in results["paths"].items():
+        for name, record in result["stages"].items():
+            old_record = baseline.get("paths", {}).get(path, {}).get("stages", {}).get(name)
+            if old_record and record["seconds"] > old_record["seconds"] * (1 + tolerance):
+                regressions.append("{}.{}: {:.3f} с -> {:.3f} с".format(
+                    path, name, old_record["seconds"], record["seconds"]))
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Замеры путей обработки вакансий на синтетических данных")
+    vacancy_generator.add_arguments(parser)
+    parser.add_argument("--profession", default="Программист", help="название профессии")
+    parser.add_argument("--paths", nargs="+", choices=PATHS, help="пути выполнения, по умолчанию все")
+    parser.add_argument("--repeat", type=int, default=1, help="количество повторов, берётся лучшее время")
+    parser.add_argument("--output", default="benchmark.json", help="файл для результатов")
+    parser.add_argument("--baseline", help="json прошлого запуска для поиска замедлений")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="допустимая доля замедления")
+    parser.add_argument("--profile", action="store_true", help="снимать профиль cProfile для каждого пути")
+    parser.add_argument("--memory", action="store_true",
+                        help="замерять память этапов (tracemalloc, пиковая память процессов, объекты Vacancy и dict)")
+    parser.add_argument("--workdir", help="папка для данных, по умолчанию временная")
+    parser.add_argument("--keep", action="store_true", help="не удалять временную папку с данными")
+    arguments = parser.parse_args()
+
+    results = run_benchmark(arguments)
+    with open(arguments.output, "w", encoding='utf_8') as output_file:
+        json.dump(results, output_file, ensure_ascii=False, indent=2)
+    if arguments.baseline:
+        with open(arguments.baseline, "r", encoding='utf_8') as baseline_file:
+            regressions = compare(results, json.load(baseline_file), arguments.tolerance)
+        for regression in regressions:
+            print("Замедление {}".format(regression), file=sys.stderr)
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,221 @@
+import argparse
+import importlib
+import importlib.util
+import json
+import os
+import sys
+import time
+
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+SCRIPTS = {"task2_3": "Task2-3.py", "task3_2_1": "Task3-2-1.py", "task3_2_2": "Task 3-2-2.py",
+           "task3_2_3": "3-2-3.py"}
+
+
+class ScriptFinder:
+    """ Позволяет импортировать скрипты с дефисами и пробелами в имени под именами из SCRIPTS.
+    Скрипты импортируются обычным import, поэтому их функции передаются в процессы пулов по имени модуля,
+    в том числе при запуске процессов через spawn: дочерний процесс заново выполняет этот модуль и находит скрипты
+    """
+    @staticmethod
+    def find_spec(name, path=None, target=None):
+        if name in SCRIPTS:
+            return importlib.util.spec_from_file_location(name, os.path.join(ROOT, SCRIPTS[name]))
+        return None
+
+
+if not any(type(finder).__name__ == "ScriptFinder" for finder in sys.meta_path):
+    sys.meta_path.append(ScriptFinder())
+
+
+RATES_HELP = ("csv курсов валют по месяцам: первый столбец - месяц YYYY-MM, остальные - коды валют (USD, EUR, ...) "
+              "с курсом в рублях; пропуски заполняются предыдущим месяцем")
+
+
+def load_script(module_name):
+    """ Импортирует скрипт по имени из SCRIPTS
+
+    :param module_name: Имя модуля, например task3_2_3
+    :return: Модуль
+    """
+    return importlib.import_module(module_name)
+
+
+def print_statistics(statistic):
+    """ Печатает статистику в формате скриптов
+
+    :param statistic: Statistics или MultipleStatistics; квантили печатаются, если статистика их содержит
+    """
+    print(f"Динамика уровня зарплат по годам: {statistic.salary_by_years}")
+    print(f"Динамика количества вакансий по годам: {statistic.quantity_by_years}")
+    print(f"Динамика уровня зарплат по годам для выбранной профессии: {statistic.salary_by_profession}")
+    print(f"Динамика количества вакансий по годам для выбранной профессии: {statistic.quantity_by_profession}")
+    print(f"Уровень зарплат по городам (в порядке убывания): {statistic.salary_by_cities}")
+    print(f"Доля вакансий по городам (в порядке убывания): {statistic.share_of_cities}")
+    if hasattr(statistic, "quantiles_by_years"):
+        print(f"Зарплаты по годам, [p10, медиана, p90]: {statistic.quantiles_by_years}")
+        print(f"Зарплаты по годам для выбранной профессии, [p10, медиана, p90]: "
+              f"{statistic.quantiles_by_profession}")
+        print(f"Зарплаты по городам, [p10, медиана, p90] (в порядке убывания медианы): "
+              f"{statistic.quantiles_by_cities}")
+
+
+def split_command(arguments, run_report):
+    """ split: делит csv по годам (Task3-2-1.py) """
+    task3_2_1 = load_script("task3_2_1")
+    with run_report.stage("split") as record:
+        record["rows"] = task3_2_1.csv_splitter(arguments.file_name, arguments.folder, arguments.max_open_files)
+    megabytes = os.path.getsize(arguments.file_name) / (1 << 20)
+    seconds = run_report.stages["split"]["seconds"]
+    print(f"Строк: {record['rows']}, время: {seconds:.2f} с, скорость: {megabytes / seconds:.1f} МБ/с")
+
+
+def stats_command(arguments, run_report):
+    """ stats: статистика из csv файла или папки годов (3-2-3.py); библиотеки отчётов не загружаются """
+    task3_2_3 = load_script("task3_2_3")
+    profession_names = arguments.profession_names
+    if arguments.state:
+        statistics = {profession_names[0]: state_statistics(task3_2_3, arguments, run_report)}
+    else:
+        # папка годов читается пулом процессов, один csv файл - через кэш столбцов VacancyTable
+        if os.path.isdir(arguments.source):
+            reader = task3_2_3.MultipleReader(arguments.source)
+        else:
+            reader = task3_2_3.TableReader(arguments.source)
+        if len(profession_names) == 1:
+            cache = None if arguments.no_cache else task3_2_3.StatisticsCache()
+            statistics = {profession_names[0]: task3_2_3.MultipleStatistics(profession_names[0]).collect(
+                reader, arguments.rates, cache)}
+        else:
+            with run_report.stage("aggregate"):
+                aggregates = reader.aggregate_professions(profession_names, arguments.rates)
+            with run_report.stage("merge_statistics"):
+                statistics = task3_2_3.MultipleStatistics.merge_professions(profession_names, aggregates)
+    if arguments.json:
+        print(json.dumps({profession_name: {field: list(getattr(statistic, field).items())
+                                            for field in task3_2_3.StatisticsCache.fields}
+                          for profession_name, statistic in statistics.items()}, ensure_ascii=False))
+        return
+    for profession_name, statistic in statistics.items():
+        if len(statistics) > 1:
+            print(f"{profession_name}:")
+        print_statistics(statistic)
+
+
+def state_statistics(task3_2_3, arguments, run_report):
+    """ Добавляет к сохранённому состоянию только вакансии новее watermark и подводит статистику по состоянию
+
+    :param task3_2_3: Модуль 3-2-3.py
+    :param arguments: Аргументы подкоманды stats с --state
+    :param run_report: Текущий отчёт instrumentation
+    :return: MultipleStatistics по всему накопленному состоянию
+    """
+    if len(arguments.profession_names) != 1:
+        raise SystemExit("--state хранит состояние одной профессии")
+    if arguments.rates:
+        raise SystemExit("--state не поддерживает --rates: состояние накоплено по статичным курсам")
+    file_names = (task3_2_3.MultipleReader(arguments.source).file_names if os.path.isdir(arguments.source)
+                  else [arguments.source])
+    state = task3_2_3.AggregateState.load(arguments.state, arguments.profession_names[0])
+    added = skipped = 0
+    with run_report.stage("update") as record:
+        for file_name in file_names:
+            file_added, file_skipped = state.update(file_name)
+            added += file_added
+            skipped += file_skipped
+        record.update(rows=added, skipped=skipped)
+    state.save(arguments.state)
+    print(f"Добавлено вакансий: {added}, пропущено не новее watermark: {skipped}", file=sys.stderr)
+    statistic = task3_2_3.MultipleStatistics(arguments.profession_names[0])
+    statistic.merge_statistics([state.aggregate])
+    return statistic
+
+
+def report_command(arguments, run_report):
+    """ report: статистика и файлы отчётов (Task2-3.py) """
+    task2_3 = load_script("task2_3")
+    statistic = task2_3.make_statistic(arguments.file_name, arguments.profession_name)
+    if statistic is None:
+        return
+    print_statistics(statistic)
+    if arguments.no_files:
+        return
+    with run_report.stage("reports"):
+        report_times = task2_3.generate_reports(statistic, arguments.workers,
+                                                 arguments.file_name if arguments.details else None)
+    for name, seconds in report_times.items():
+        print("{}: {:.2f} с".format(name, seconds))
+
+
+def serve_command(arguments, run_report):
+    """ serve: http сервер статистики (3-2-3.py) """
+    task3_2_3 = load_script("task3_2_3")
+    print(f"Сервер статистики: http://{arguments.host}:{arguments.port}/statistics?profession=... "
+          f"({arguments.folder})")
+    task3_2_3.StatisticsServer(arguments.folder, arguments.rates, arguments.workers).serve(arguments.host,
+                                                                                         arguments.port)
+
+
+def make_parser():
+    """ Создаёт парсер аргументов с подкомандами split, stats, report, serve """
+    parser = argparse.ArgumentParser(description="Статистика вакансий")
+    parser.add_argument("--run-report", help="json файл отчёта о запуске (время этапов, процессы пулов)")
+    parser.add_argument("--profile", action="store_true", help="добавить в отчёт профиль cProfile")
+    parser.add_argument("--memory", action="store_true", help="замерять память этапов")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    split_parser = subparsers.add_parser("split", help="разделить csv по годам")
+    split_parser.add_argument("file_name", help="csv файл вакансий")
+    split_parser.add_argument("--folder", default="CSV_files", help="папка для файлов годов")
+    split_parser.add_argument("--max-open-files", type=int, default=32, help="наибольшее число открытых файлов")
+    split_parser.set_defaults(function=split_command)
+
+    stats_parser = subparsers.add_parser("stats", help="статистика по профессиям без отчётов")
+    stats_parser.add_argument("source", help="csv файл или папка с файлами годов")
+    stats_parser.add_argument("profession_names", nargs="+", help="названия профессий")
+    stats_parser.add_argument("--rates", help=RATES_HELP)
+    stats_parser.add_argument("--no-cache", action="store_true", help="не использовать кэш статистики")
+    stats_parser.add_argument("--json", action="store_true", help="вывести результат в json")
+    stats_parser.add_argument("--state", help="json файл накопленного состояния: добавляются только вакансии "
+                                              "новее сохранённого watermark по published_at")
+    stats_parser.set_defaults(function=stats_command)
+
+    report_parser = subparsers.add_parser("report", help="статистика и отчёты graph.png, report.xlsx, report.pdf")
+    report_parser.add_argument("file_name", help="csv файл вакансий")
+    report_parser.add_argument("profession_name", help="название профессии")
+    report_parser.add_argument("--workers", type=int, default=3, help="количество процессов для отчётов")
+    report_parser.add_argument("--details", action="store_true", help="добавить в report.xlsx лист вакансий")
+    report_parser.add_argument("--no-files", action="store_true", help="только статистика, без файлов отчётов")
+    report_parser.set_defaults(function=report_command)
+
+    serve_parser = subparsers.add_parser("serve", help="http сервер статистики")
+    serve_parser.add_argument("folder", nargs="?", default="CSV_files", help="папка с файлами годов")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8000)
+    serve_parser.add_argument("--rates", help=RATES_HELP)
+    serve_parser.add_argument("--workers", type=int, help="количество процессов")
+    serve_parser.set_defaults(function=serve_command)
+    return parser
+
+
+def main(argv=None):
+    """ Разбирает аргументы и выполняет подкоманду; отчёт о запуске сохраняется, если передан --run-report
+
+    :param argv: Аргументы командной строки, по умолчанию sys.argv
+    """
+    start = time.perf_counter()
+    arguments = make_parser().parse_args(argv)
+    import instrumentation
+    with instrumentation.RunReport(f"cli {arguments.command}", profile=arguments.profile, memory=arguments.memory,
+                                   object_types=("Vacancy", "dict") if arguments.memory else ()) as run_report:
+        arguments.function(arguments, run_report)
+    if arguments.run_report:
+        result = run_report.to_dict()
+        result["seconds_since_start"] = time.perf_counter() - start
+        with open(arguments.run_report, "w", encoding='utf_8') as report_file:
+            json.dump(result, report_file, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
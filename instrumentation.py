@@ -0,0 +1,359 @@
+import contextlib
+import datetime
+import gc
+import io
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+active_report = None
+
+MEGABYTE = 1 << 20
+
+
+class MemoryBudgetExceeded(AssertionError):
+    pass
+
+
+def get_peak_rss():
+    """ Возвращает пиковый размер резидентной памяти текущего процесса за всё время его работы
+
+    :return: Мегабайты, None если модуль resource недоступен (Windows)
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / MEGABYTE if sys.platform == "darwin" else peak / 1024
+
+
+def count_objects(type_names):
+    """ Считает живые объекты заданных типов и их собственный размер (sys.getsizeof).
+    Словари только из строк и чисел сборщик мусора не отслеживает, поэтому они ищутся среди ссылок
+    отслеживаемых объектов. Обходит всю кучу, поэтому используется только по запросу
+
+    :param type_names: Имена типов, например ("Vacancy", "dict")
+    :return: Словарь {имя типа: {"count": количество, "size_mb": мегабайты}}
+    """
+    counts = {type_name: {"count": 0, "size": 0} for type_name in type_names}
+    seen = set()
+    objects = gc.get_objects()
+    for container in objects:
+        for instance in [container] + gc.get_referents(container):
+            type_name = type(instance).__name__
+            if type_name in counts and id(instance) not in seen:
+                seen.add(id(instance))
+                counts[type_name]["count"] += 1
+                counts[type_name]["size"] += sys.getsizeof(instance)
+    del objects
+    return {type_name: {"count": value["count"], "size_mb": value["size"] / MEGABYTE}
+            for type_name, value in counts.items()}
+
+
+class RunReport:
+    """ Отчёт о запуске: время и процессорное время этапов, количество строк, разбивка по процессам пулов
+    и, по желанию, профиль cProfile. Замеряются только крупные этапы, поэтому отчёт можно не выключать
+
+    Attributes:
+        name (str): Название запуска
+        stages (dict): Словарь этапов верхнего уровня, вложенные этапы хранятся в поле stages этапа
+        open_stages (list): Стек открытых этапов
+        profiler (cProfile.Profile): Профилировщик, None если профиль не нужен
+        profile_limit (int): Количество функций в профиле
+        memory (bool): Замерять ли память этапов через tracemalloc; замедляет выделение памяти, поэтому по запросу
+        object_types (tuple): Имена типов, объекты которых считаются в конце каждого этапа
+        snapshot_limit (int): Количество строк кода с наибольшим приростом памяти в снимке этапа
+    """
+    def __init__(self, name, profile=False, profile_limit=30, memory=False, object_types=(), snapshot_limit=10):
+        self.name = name
+        self.stages = {}
+        self.open_stages = []
+        self.memory = memory
+        self.object_types = tuple(object_types)
+        self.snapshot_limit = snapshot_limit
+        self.memory_stack = []
+        self.started_tracemalloc = False
+        self.peak_traced_mb = None
+        self.started_at = datetime.datetime.now().isoformat(timespec="seconds")
+        self.start = time.perf_counter()
+        self.cpu_start = time.process_time()
+        self.seconds = None
+        self.cpu_seconds = None
+        self.profiler = None
+        if profile:
+            # cProfile и pstats загружаются только для профиля, они заметно удлиняют запуск
+            import cProfile
+            self.profiler = cProfile.Profile()
+        self.profile_limit = profile_limit
+        self.previous_report = None
+
+    def __enter__(self):
+        global active_report
+        self.previous_report, active_report = active_report, self
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracemalloc = True
+        if self.profiler is not None:
+            self.profiler.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        global active_report
+        if self.profiler is not None:
+            self.profiler.disable()
+        self.seconds = time.perf_counter() - self.start
+        self.cpu_seconds = time.process_time() - self.cpu_start
+        if self.memory:
+            self.peak_traced_mb = tracemalloc.get_traced_memory()[1] / MEGABYTE
+            self.peak_traced_mb = max([self.peak_traced_mb] + [record["memory"]["peak_traced_mb"]
+                                                               for record in self.stages.values()
+                                                               if "memory" in record])
+        if self.started_tracemalloc:
+            tracemalloc.stop()
+            self.started_tracemalloc = False
+        active_report = self.previous_report
+
+    @contextlib.contextmanager
+    def stage(self, name, rows=None):
+        """ Замеряет этап. Количество строк можно передать сразу или записать в выдаваемый словарь по ключу rows
+
+        :param name: Название этапа
+        :param rows: Количество обрабатываемых строк
+        """
+        record = {"rows": rows}
+        stages = self.open_stages[-1].setdefault("stages", {}) if self.open_stages else self.stages
+        key, count = name, 2
+        while key in stages:
+            key, count = "{}#{}".format(name, count), count + 1
+        stages[key] = record
+        self.open_stages.append(record)
+        if self.memory:
+            self.start_memory()
+        start, cpu_start = time.perf_counter(), time.process_time()
+        try:
+            yield record
+        finally:
+            record["seconds"] = time.perf_counter() - start
+            record["cpu_seconds"] = time.process_time() - cpu_start
+            set_rows_per_second(record)
+            if self.memory:
+                record["memory"] = self.stop_memory()
+            if self.object_types:
+                record["objects"] = count_objects(self.object_types)
+                if self.memory:
+                    # Память на обход кучи не относится ни к этому этапу, ни к внешним
+                    tracemalloc.reset_peak()
+            self.open_stages.pop()
+
+    def start_memory(self):
+        """ Начинает замер памяти этапа: пик tracemalloc сбрасывается, а накопленный пик
+        передаётся открытым внешним этапам, чтобы вложенный этап не терял их пик
+        """
+        current, peak = tracemalloc.get_traced_memory()
+        for memory in self.memory_stack:
+            memory["peak"] = max(memory["peak"], peak)
+        tracemalloc.reset_peak()
+        self.memory_stack.append({"start": current, "peak": current, "snapshot": self.take_snapshot()})
+
+    @staticmethod
+    def take_snapshot():
+        """ Снимок tracemalloc без выделений памяти самого tracemalloc и этого модуля
+
+        :return: tracemalloc.Snapshot
+        """
+        return tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, tracemalloc.__file__),
+                                                          tracemalloc.Filter(False, __file__)])
+
+    def stop_memory(self):
+        """ Завершает замер памяти этапа
+
+        :return: Словарь с приростом памяти tracemalloc, пиком с начала запуска и пиком сверх памяти
+            на начало этапа, пиковой памятью процесса и строками кода с наибольшим приростом памяти
+        """
+        memory = self.memory_stack.pop()
+        current, peak = tracemalloc.get_traced_memory()
+        peak = max(memory["peak"], peak)
+        if self.memory_stack:
+            self.memory_stack[-1]["peak"] = max(self.memory_stack[-1]["peak"], peak)
+        statistics = self.take_snapshot().compare_to(memory["snapshot"], "lineno")
+        return {"delta_mb": (current - memory["start"]) / MEGABYTE, "peak_traced_mb": peak / MEGABYTE,
+                "peak_delta_mb": (peak - memory["start"]) / MEGABYTE,
+                "peak_rss_mb": get_peak_rss(),
+                "top_allocations": [{"line": "{}:{}".format(os.path.basename(statistic.traceback[0].filename),
+                                                            statistic.traceback[0].lineno),
+                                     "size_diff_mb": statistic.size_diff / MEGABYTE,
+                                     "count_diff": statistic.count_diff}
+                                    for statistic in statistics[:self.snapshot_limit]]}
+
+    def add_workers(self, workers):
+        """ Добавляет к текущему этапу записи о работе процессов пула
+
+        :param workers: Лист словарей из call_timed
+        """
+        if self.open_stages:
+            self.open_stages[-1].setdefault("workers", []).extend(workers)
+
+    def get_profile(self):
+        """ Формирует самые затратные по накопленному времени функции родительского процесса
+
+        :return: Лист словарей функций
+        """
+        import pstats
+        stats = pstats.Stats(self.profiler, stream=io.StringIO()).sort_stats("cumulative")
+        profile = []
+        for (file_name, line, function), (calls, primitive_calls, total, cumulative, callers) \
+                in sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:self.profile_limit]:
+            profile.append({"function": "{}:{}({})".format(os.path.basename(file_name), line, function),
+                            "calls": calls, "total_seconds": total, "cumulative_seconds": cumulative})
+        return profile
+
+    def to_dict(self):
+        """ Формирует отчёт для json
+
+        :return: Словарь отчёта
+        """
+        report = {"name": self.name, "started_at": self.started_at,
+                  "seconds": self.seconds if self.seconds is not None else time.perf_counter() - self.start,
+                  "cpu_seconds": self.cpu_seconds if self.cpu_seconds is not None
+                  else time.process_time() - self.cpu_start,
+                  "pid": os.getpid(), "python": platform.python_version(), "cpu_count": os.cpu_count(),
+                  "stages": self.stages}
+        if self.profiler is not None:
+            report["profile"] = self.get_profile()
+        if self.memory:
+            report["memory"] = {"peak_traced_mb": self.peak_traced_mb,
+                                "peak_rss_mb": get_peak_rss()}
+        return report
+
+    def iter_stages(self, stages=None, prefix=""):
+        """ Перебирает все этапы, включая вложенные
+
+        :return: Генератор кортежей (полное имя этапа через точку, словарь этапа)
+        """
+        for name, record in (self.stages if stages is None else stages).items():
+            yield prefix + name, record
+            yield from self.iter_stages(record.get("stages", {}), prefix + name + ".")
+
+    def check_memory_budget(self, budget_mb, stage_name=None):
+        """ Проверяет, что пик памяти tracemalloc этапа или всего запуска не превысил бюджет
+
+        :param budget_mb: Бюджет в мегабайтах
+        :param stage_name: Полное имя этапа через точку, None - весь запуск
+        :raises MemoryBudgetExceeded: Если пик больше бюджета
+        """
+        if stage_name is None:
+            peak = self.peak_traced_mb
+        else:
+            peak = dict(self.iter_stages())[stage_name]["memory"]["peak_traced_mb"]
+        if peak > budget_mb:
+            raise MemoryBudgetExceeded("{}: пик памяти {:.1f} МБ больше бюджета {:.1f} МБ".format(
+                stage_name or self.name, peak, budget_mb))
+
+    def save(self, file_name):
+        """ Сохраняет отчёт в json файл
+
+        :param file_name: Имя json файла
+        """
+        with open(file_name, "w", encoding='utf_8') as report_file:
+            json.dump(self.to_dict(), report_file, ensure_ascii=False, indent=2)
+
+
+def set_rows_per_second(record):
+    """ Дописывает в запись скорость обработки строк
+
+    :param record: Словарь с полями rows и seconds
+    """
+    if record.get("rows") is not None and record["seconds"] > 0:
+        record["rows_per_second"] = record["rows"] / record["seconds"]
+
+
+@contextlib.contextmanager
+def stage(name, rows=None):
+    """ Замеряет этап в активном отчёте; без активного отчёта ничего не записывает
+
+    :param name: Название этапа
+    :param rows: Количество обрабатываемых строк
+    """
+    if active_report is None:
+        yield {"rows": rows}
+    else:
+        with active_report.stage(name, rows) as record:
+            yield record
+
+
+def call_timed(function, data):
+    """ Вызывает функцию в процессе пула и замеряет её работу
+
+    :param function: Функция уровня модуля
+    :param data: Аргумент функции
+    :return: Кортеж (результат, словарь с pid, временем, процессорным временем и пиковой памятью процесса,
+        которая копится за все задачи этого процесса)
+    """
+    start, cpu_start = time.perf_counter(), time.process_time()
+    result = function(data)
+    return result, {"pid": os.getpid(), "seconds": time.perf_counter() - start,
+                    "cpu_seconds": time.process_time() - cpu_start, "peak_rss_mb": get_peak_rss()}
+
+
+def map_timed(pool, function, items, labels=None, rows=None):
+    """ pool.map с замером каждого вызова; записи о процессах добавляются к текущему этапу активного отчёта
+
+    :param pool: Пул процессов
+    :param function: Функция уровня модуля
+    :param items: Аргументы функции
+    :param labels: Подписи вызовов, например имена файлов
+    :param rows: Функция, возвращающая количество строк по результату вызова
+    :return: Лист результатов
+    """
+    items = list(items)
+    results = []
+    workers = []
+    for index, (result, worker) in enumerate(pool.map(call_timed, [function] * len(items), items)):
+        if labels is not None:
+            worker["label"] = labels[index]
+        if rows is not None:
+            worker["rows"] = rows(result)
+            set_rows_per_second(worker)
+        results.append(result)
+        workers.append(worker)
+    if active_report is not None:
+        active_report.add_workers(workers)
+    return results
+
+
+@contextlib.contextmanager
+def memory_budget(budget_mb):
+    """ Контекст для тестов: проверяет, что пик памяти tracemalloc внутри блока не превысил бюджет
+
+    :param budget_mb: Бюджет в мегабайтах
+    :raises MemoryBudgetExceeded: Если пик больше бюджета
+    """
+    with RunReport("memory_budget", memory=True) as report:
+        with report.stage("block"):
+            yield report
+    report.check_memory_budget(budget_mb, "block")
+
+
+@contextlib.contextmanager
+def run(name):
+    """ Запускает отчёт, настроенный переменными окружения: VACANCIES_RUN_REPORT - имя json файла отчёта,
+    VACANCIES_PROFILE=1 - включить cProfile, VACANCIES_MEMORY=1 - замерять память этапов и считать объекты
+    Vacancy и dict
+
+    :param name: Название запуска
+    """
+    report_file = os.environ.get("VACANCIES_RUN_REPORT")
+    memory = os.environ.get("VACANCIES_MEMORY") == "1"
+    with RunReport(name, profile=os.environ.get("VACANCIES_PROFILE") == "1", memory=memory,
+                   object_types=("Vacancy", "dict") if memory else ()) as report:
+        yield report
+    if report_file:
+        report.save(report_file)
@@ -0,0 +1,42 @@
+import codecs
+import csv
+import os
+import random
+import tempfile
+from unittest import TestCase
+
+import cli
+
+task3_2_1 = cli.load_script("task3_2_1")
+
+
+class ProjectTests(TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.addCleanup(self.folder.cleanup)
+        cwd = os.getcwd()
+        os.chdir(self.folder.name)
+        self.addCleanup(os.chdir, cwd)
+
+    def test_csv_splitter_reopens_files_with_few_handles(self):
+        headers = ["name", "salary_from", "salary_to", "salary_currency", "area_name", "published_at"]
+        rnd = random.Random(1)
+        rows = [[f"Программист {index}", str(index * 100), "", "RUR", "Москва",
+                 f"{rnd.randrange(2007, 2023)}-07-05T18:19:30+0300"] for index in range(500)]
+        with open("vacancies.csv", "w", encoding='utf_8_sig', newline='') as csv_file:
+            csv.writer(csv_file).writerows([headers] + rows)
+
+        self.assertEqual(task3_2_1.csv_splitter("vacancies.csv", "CSV_files", max_open_files=2), len(rows))
+
+        years = sorted({row[-1][:4] for row in rows})
+        self.assertEqual(sorted(os.listdir("CSV_files")), [f"{year}.csv" for year in years])
+        for year in years:
+            file_name = os.path.join("CSV_files", f"{year}.csv")
+            with open(file_name, "rb") as csv_file:
+                data = csv_file.read()
+            self.assertTrue(data.startswith(codecs.BOM_UTF8), year)
+            self.assertEqual(data.count(codecs.BOM_UTF8), 1, year)
+            with open(file_name, "r", encoding='utf_8_sig', newline='') as csv_file:
+                year_rows = list(csv.reader(csv_file))
+            self.assertEqual(year_rows[0], headers, year)
+            self.assertEqual(year_rows[1:], [row for row in rows if row[-1][:4] == year], year)
@@ -0,0 +1,270 @@
+import csv
+import io
+import json
+import os
+import random
+import tempfile
+import threading
+import urllib.error
+import urllib.parse
+import urllib.request
+from unittest import TestCase, mock
+
+import numpy as np
+
+import cli
+import vacancy_generator
+
+task3_2_3 = cli.load_script("task3_2_3")
+
+
+class ProjectTests(TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.addCleanup(self.folder.cleanup)
+        cwd = os.getcwd()
+        os.chdir(self.folder.name)
+        self.addCleanup(os.chdir, cwd)
+
+    def write_csv(self, file_name, text, newline="\n"):
+        with open(file_name, "w", encoding='utf_8_sig', newline='') as csv_file:
+            csv_file.write(text.replace("\n", newline))
+        return file_name
+
+    def test_split_byte_ranges_matches_csv_reader(self):
+        rows = [["name", "salary_from", "salary_to", "salary_currency", "area_name", "published_at"]]
+        rnd = random.Random(1)
+        for index in range(40):
+            name = rnd.choice(["Программист", "Аналитик \"данных\"", "Инженер,\nпрограммист", "1С\n\n"])
+            rows.append([name, str(index * 100), str(index * 200), "RUR", "Москва", "2022-07-05T18:19:30+0300"])
+        for newline in ("\n", "\r\n"):
+            text = io.StringIO()
+            csv.writer(text, lineterminator=newline).writerows(rows)
+            file_name = self.write_csv("quoted.csv", text.getvalue(), "\n")
+            for block_size in (1, 2, 3, 7, 64, 1 << 20):
+                for parts in (1, 2, 3, 5, 17):
+                    header, ranges = task3_2_3.DataSet.split_byte_ranges(file_name, parts, block_size)
+                    self.assertEqual(header, rows[0])
+                    self.assertEqual(ranges[-1][1], os.path.getsize(file_name))
+                    self.assertEqual([row for start, end in ranges
+                                      for row in task3_2_3.DataSet.read_byte_range(file_name, start, end)], rows[1:])
+
+    def test_vacancy_table_parallel_from_csv(self):
+        vacancy_generator.generate("vacancies.csv", 3000, 4)
+        table_class = task3_2_3.VacancyTable
+        sequential = table_class.from_csv("vacancies.csv", workers=1)
+        parallel = table_class.from_csv("vacancies.csv", workers=2, part_size=20000)
+        self.assertEqual((parallel.areas, parallel.names), (sequential.areas, sequential.names))
+        for column in ("salary_from", "salary_to", "currency", "area", "year", "month", "name"):
+            self.assertEqual(getattr(parallel, column).dtype, getattr(sequential, column).dtype, column)
+            self.assertEqual(getattr(parallel, column).tolist(), getattr(sequential, column).tolist(), column)
+
+    def test_profession_matcher_equals_in(self):
+        profession_names = ["программист", "про", "грамм", "ист", "1С", "аналитик", "к", "программист 1С"]
+        matcher = task3_2_3.ProfessionMatcher(profession_names)
+        rnd = random.Random(2)
+        texts = ["", "программист 1С", "ведущий аналитик", "прпрограммист"]
+        texts += ["".join(rnd.choice("прогамиск1С ") for _ in range(rnd.randrange(30))) for _ in range(500)]
+        for text in texts:
+            self.assertEqual(matcher.match(text),
+                             {index for index, name in enumerate(profession_names) if name in text}, text)
+
+    def test_name_index_get_rows_equals_full_scan(self):
+        rnd = random.Random(3)
+        names = [vacancy_generator.make_name(rnd, 0) for _ in range(300)]
+        name_column = np.array([rnd.randrange(len(names)) for _ in range(5000)], dtype=np.int32)
+        index = task3_2_3.NameIndex.build(names, name_column)
+        for profession_name in ["Программист", "Java", "ер", "Senior Python", "нет такой", "", "1С"]:
+            expected = np.flatnonzero([profession_name in names[code] for code in name_column.tolist()])
+            self.assertEqual(index.get_rows(profession_name).tolist(), expected.tolist(), profession_name)
+
+    def test_vacancy_table_cache_rebuilds_on_changes(self):
+        header = "name,salary_from,salary_to,salary_currency,area_name,published_at\n"
+        row = "Программист,{},20000.0,RUR,Москва,2022-07-05T18:19:30+0300\n"
+        file_name = self.write_csv("vacancies.csv", header + row.format("10000.0"))
+        table_class = task3_2_3.VacancyTable
+        with mock.patch.object(table_class, "from_csv", side_effect=table_class.from_csv) as from_csv:
+            self.assertEqual(table_class.load(file_name).salary_from.tolist(), [10000.0])
+            self.assertEqual(table_class.load(file_name).salary_from.tolist(), [10000.0])
+            self.assertEqual(from_csv.call_count, 1)
+
+            stat = os.stat(file_name)
+            os.utime(file_name, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+            self.assertEqual(table_class.load(file_name).salary_from.tolist(), [10000.0])
+            self.assertEqual(from_csv.call_count, 1)
+
+            self.write_csv(file_name, header + row.format("30000.0"))
+            os.utime(file_name, ns=(stat.st_atime_ns, stat.st_mtime_ns + 2 * 10 ** 9))
+            self.assertEqual(table_class.load(file_name).salary_from.tolist(), [30000.0])
+            self.assertEqual(from_csv.call_count, 2)
+
+            self.write_csv(file_name, header + row.format("30000.0") + row.format("5000.0"))
+            self.assertEqual(table_class.load(file_name).salary_from.tolist(), [30000.0, 5000.0])
+            self.assertEqual(from_csv.call_count, 3)
+
+    def test_aggregate_state_folds_only_new_rows(self):
+        header = "name,salary_from,salary_to,salary_currency,area_name,published_at\n"
+        names = ["Программист", "Аналитик"]
+        cities = ["Москва", "Казань", "Омск"]
+        rows = ["{},{}.0,{}.0,RUR,{},2022-{:02d}-05T18:19:30+0300\n".format(
+                    names[month % 2], month * 1000, month * 3000, cities[month % 3], month) for month in range(1, 10)]
+        self.write_csv("first.csv", header + "".join(rows[:6]))
+        self.write_csv("second.csv", header + "".join(rows[3:]))
+        self.write_csv("all.csv", header + "".join(rows))
+
+        state = task3_2_3.AggregateState.load("state.json", "Программист")
+        self.assertEqual(state.update("first.csv"), (6, 0))
+        state.save("state.json")
+        state = task3_2_3.AggregateState.load("state.json", "Программист")
+        self.assertEqual(state.update("second.csv"), (3, 3))
+
+        vocabularies = task3_2_3.DataSet.make_vocabularies()
+        rebuild = task3_2_3.make_aggregate((task3_2_3.DataSet.iter_vacancies("all.csv", vocabularies),
+                                            "Программист", vocabularies))
+        expected = task3_2_3.MultipleStatistics("Программист")
+        expected.merge_statistics([rebuild])
+        actual = task3_2_3.MultipleStatistics("Программист")
+        actual.merge_statistics([state.aggregate])
+        for field in task3_2_3.StatisticsCache.fields:
+            self.assertEqual(getattr(actual, field), getattr(expected, field), field)
+
+    def test_currency_rates_from_csv_and_lookup(self):
+        rates_class = task3_2_3.CurrencyRates
+        self.write_csv("rates.csv", "month,USD,EUR,RUR,XXX\n2021-01,70,,5,1\n2021-03,,90,,\n2021-04,75,91,,\n")
+        rates = rates_class.from_csv("rates.csv")
+        code = rates_class.currencies.index
+        months = np.array([2020 * 12 + 11, 2021 * 12, 2021 * 12 + 1, 2021 * 12 + 2, 2021 * 12 + 3, 2023 * 12])
+        self.assertEqual(rates.lookup(np.full(6, code("USD")), months).tolist(), [70, 70, 70, 70, 75, 75])
+        eur = task3_2_3.CURRENCY_TO_RUB["EUR"]
+        self.assertEqual(rates.lookup(np.full(6, code("EUR")), months).tolist(), [eur, eur, eur, 90, 91, 91])
+        self.assertEqual(rates.lookup(np.full(6, code("RUR")), months).tolist(), [1] * 6)
+        self.assertEqual(rates.lookup(np.full(6, code("KZT")), months).tolist(),
+                         [task3_2_3.CURRENCY_TO_RUB["KZT"]] * 6)
+
+        self.assertIs(rates_class.from_csv("rates.csv"), rates)
+        stat = os.stat("rates.csv")
+        self.write_csv("rates.csv", "month,USD\n2021-01,80\n")
+        os.utime("rates.csv", ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        self.assertEqual(rates_class.from_csv("rates.csv").lookup(np.array([code("USD")]), months[:1]).tolist(), [80])
+
+    def make_sketch(self, salary):
+        sketches = {}
+        task3_2_3.SalarySketch.fill(sketches, [0], *task3_2_3.SalarySketch.count_buckets(
+            np.zeros(len(salary), dtype=np.int64), 1, task3_2_3.SalarySketch.get_buckets(salary)))
+        return sketches[0]
+
+    def test_salary_sketch_error_bound_and_merge_order(self):
+        rnd = np.random.default_rng(5)
+        salary = np.concatenate([np.round(rnd.lognormal(11, 0.7, 20000), -2), rnd.uniform(1, 500, 500),
+                                 np.ones(100)])
+        parts = [self.make_sketch(part) for part in np.array_split(rnd.permutation(salary), 7)]
+        sorted_salary = np.sort(salary)
+        accuracy = task3_2_3.SalarySketch.relative_accuracy
+        results = []
+        for order in ([0, 1, 2, 3, 4, 5, 6], [6, 5, 4, 3, 2, 1, 0], [3, 0, 6, 1, 5, 2, 4]):
+            sketch = task3_2_3.SalarySketch()
+            for index in order:
+                sketch.merge(parts[index])
+            self.assertEqual(sketch.count, len(salary))
+            results.append(sketch.quantiles(0.1, 0.5, 0.9, 0.0, 1.0))
+        self.assertEqual(results[1], results[0])
+        self.assertEqual(results[2], results[0])
+        self.assertEqual(results[0], self.make_sketch(salary).quantiles(0.1, 0.5, 0.9, 0.0, 1.0))
+        for quantile, estimate in zip((0.1, 0.5, 0.9, 0.0, 1.0), results[0]):
+            exact = sorted_salary[int(quantile * (len(salary) - 1))]
+            self.assertLessEqual(abs(estimate - exact), accuracy * exact + 0.5, quantile)
+
+    def test_salary_sketch_small_salaries(self):
+        self.assertEqual(self.make_sketch(np.ones(10)).quantiles(0.1, 0.5, 0.9), [1, 1, 1])
+        self.assertEqual(self.make_sketch(np.array([0.0, 0.5, 1.0])).quantiles(0.5), [1])
+        self.assertEqual(self.make_sketch(np.array([2.0, 2.0, 100.0])).quantiles(0.5), [2])
+
+    def test_statistics_cache_hit_and_invalidation(self):
+        os.mkdir("CSV_files")
+        for year in (2020, 2021):
+            vacancy_generator.generate(os.path.join("CSV_files", f"{year}.csv"), 200, year, (year, year), 20)
+        cache = task3_2_3.StatisticsCache("cache")
+        reader = task3_2_3.MultipleReader("CSV_files")
+        expected = task3_2_3.MultipleStatistics("Программист").collect(reader, cache=cache)
+        self.assertEqual(len(os.listdir("cache")), 1)
+
+        with mock.patch.object(task3_2_3.MultipleReader, "aggregate", side_effect=AssertionError("cache miss")):
+            cached = task3_2_3.MultipleStatistics("Программист").collect(reader, cache=cache)
+        for field in task3_2_3.StatisticsCache.fields:
+            self.assertEqual(json.dumps(list(getattr(cached, field).items())),
+                             json.dumps(list(getattr(expected, field).items())), field)
+
+        file_name = os.path.join("CSV_files", "2021.csv")
+        key = cache.get_key(reader.file_names, "Программист")
+        stat = os.stat(file_name)
+        os.utime(file_name, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        self.assertNotEqual(cache.get_key(reader.file_names, "Программист"), key)
+        self.assertIsNone(cache.get(cache.get_key(reader.file_names, "Программист")))
+
+        key = cache.get_key(reader.file_names, "Программист")
+        with open(file_name, "r+b") as csv_file:
+            csv_file.seek(0, os.SEEK_END)
+            csv_file.write(b"\n")
+        os.utime(file_name, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        self.assertNotEqual(cache.get_key(reader.file_names, "Программист"), key)
+
+        rebuilt = task3_2_3.MultipleStatistics("Программист").collect(reader, cache=cache)
+        self.assertEqual(rebuilt.salary_by_years, expected.salary_by_years)
+        self.assertEqual(len(os.listdir("cache")), 2)
+
+    def test_statistics_cache_evicts_least_recently_used(self):
+        statistics = task3_2_3.MultipleStatistics("Программист")
+        for field in task3_2_3.StatisticsCache.fields:
+            setattr(statistics, field, {2022: 1})
+        cache = task3_2_3.StatisticsCache("cache", max_size=1 << 20)
+        for index in range(5):
+            cache.put(f"key{index}", statistics)
+            os.utime(os.path.join("cache", f"key{index}.json"), ns=(index * 10 ** 9, index * 10 ** 9))
+        entry_size = os.path.getsize(os.path.join("cache", "key0.json"))
+        self.assertIsNotNone(cache.get("key0"))
+
+        cache.max_size = 3 * entry_size
+        cache.evict()
+        self.assertEqual(sorted(os.listdir("cache")), ["key0.json", "key3.json", "key4.json"])
+        self.assertIsNone(cache.get("key1"))
+        self.assertEqual(cache.get("key4")["salary_by_years"], {2022: 1})
+
+    def get_json(self, url):
+        try:
+            with urllib.request.urlopen(url) as response:
+                return response.status, json.load(response)
+        except urllib.error.HTTPError as error:
+            return error.code, json.load(error)
+
+    def test_statistics_server(self):
+        os.mkdir("CSV_files")
+        for year in (2020, 2021, 2022):
+            vacancy_generator.generate(os.path.join("CSV_files", f"{year}.csv"), 300, year, (year, year), 20)
+        expected = task3_2_3.MultipleStatistics("Программист").collect(task3_2_3.MultipleReader("CSV_files"))
+        server = task3_2_3.StatisticsServer("CSV_files", workers=1)
+        httpd = server.make_server(port=0)
+        thread = threading.Thread(target=httpd.serve_forever)
+        thread.start()
+        try:
+            url = "http://127.0.0.1:{}".format(httpd.server_address[1])
+            status, body = self.get_json(url + "/health")
+            self.assertEqual(status, 200)
+            self.assertEqual(body["files"], 3)
+            self.assertEqual(body["rows"], sum(len(table) for table in task3_2_3.server_tables))
+
+            status, body = self.get_json(url + "/statistics?profession=" + urllib.parse.quote("Программист"))
+            self.assertEqual(status, 200)
+            for field in task3_2_3.StatisticsCache.fields:
+                self.assertEqual(body["Программист"][field],
+                                 json.loads(json.dumps(list(getattr(expected, field).items()), ensure_ascii=False)),
+                                 field)
+
+            self.assertEqual(self.get_json(url + "/statistics")[0], 404)
+            with mock.patch.object(server, "query", side_effect=ValueError("ошибка")):
+                self.assertEqual(self.get_json(url + "/statistics?profession=x"),
+                                 (500, {"error": "ValueError: ошибка"}))
+        finally:
+            httpd.shutdown()
+            thread.join()
+            httpd.server_close()
+            server.close()
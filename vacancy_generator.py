@@ -0,0 +1,157 @@
+import argparse
+import csv
+import random
+
+
+HEADERS = ['name', 'salary_from', 'salary_to', 'salary_currency', 'area_name', 'published_at']
+
+PROFESSIONS = ["Программист", "Аналитик", "Менеджер по продажам", "Инженер-программист", "Тестировщик",
+               "Дизайнер", "Бухгалтер", "Юрист", "Водитель", "Python developer", "Java developer",
+               "Системный администратор", "Программист 1С", "Frontend developer", "DevOps engineer"]
+
+LEVELS = ["", "", "", "Junior ", "Middle ", "Senior ", "Ведущий ", "Старший "]
+
+CITIES = ["Москва", "Санкт-Петербург", "Новосибирск", "Екатеринбург", "Казань", "Нижний Новгород",
+          "Краснодар", "Самара", "Ростов-на-Дону", "Челябинск", "Уфа", "Воронеж", "Пермь", "Омск", "Минск",
+          "Алматы", "Нур-Султан", "Ташкент", "Баку", "Тбилиси", "Бишкек", "Киев", "Харьков"]
+
+CURRENCIES = {"RUR": 0.86, "USD": 0.04, "EUR": 0.02, "KZT": 0.03, "BYR": 0.02, "UAH": 0.01, "UZS": 0.01,
+              "AZN": 0.004, "GEL": 0.003, "KGS": 0.003}
+
+SALARY_SCALE = {"RUR": 1, "USD": 1 / 60, "EUR": 1 / 60, "KZT": 7.7, "BYR": 1 / 24, "UAH": 1 / 1.6,
+                "UZS": 180, "AZN": 1 / 36, "GEL": 1 / 22, "KGS": 1.3}
+
+HTML_TAGS = ["<b>{}</b>", "<strong>{}</strong>", "<span class=\"highlight\">{}</span>", "<i>{}</i>",
+             "<p>{}</p>", "<em>{}</em>"]
+
+
+def get_cities(cities_count):
+    """ Формирует список городов: сначала настоящие, затем нумерованные
+
+    :param cities_count: Количество городов
+    :return: Лист названий городов
+    """
+    return (CITIES + ["Город {}".format(index) for index in range(len(CITIES), cities_count)])[:cities_count]
+
+
+def make_name(rnd, html_share):
+    """ Формирует название вакансии, часть названий содержит html теги и лишние пробелы
+
+    :param rnd: Генератор случайных чисел
+    :param html_share: Доля названий с html разметкой
+    :return: Название вакансии
+    """
+    name = rnd.choice(LEVELS) + rnd.choice(PROFESSIONS)
+    if rnd.random() < html_share:
+        words = name.split()
+        index = rnd.randrange(len(words))
+        words[index] = rnd.choice(HTML_TAGS).format(words[index])
+        name = rnd.choice([" ", "  ", "\n", " \t "]).join(words)
+    return name
+
+
+def generate(file_name, rows=100000, seed=0, years=(2007, 2022), cities_count=200, city_skew=1.1,
+             currencies=None, html_share=0.3, empty_share=0.02, sorted_dates=True):
+    """ Создаёт csv файл вакансий в формате выгрузки hh.ru. При одинаковых параметрах файл получается одинаковым
+
+    :param file_name: Имя csv файла
+    :param rows: Количество вакансий
+    :param seed: Зерно генератора случайных чисел
+    :param years: Кортеж (первый год, последний год)
+    :param cities_count: Количество городов
+    :param city_skew: Показатель распределения Ципфа для городов: чем больше, тем сильнее вакансии
+        сосредоточены в первых городах
+    :param currencies: Словарь долей валют, по умолчанию CURRENCIES
+    :param html_share: Доля названий с html разметкой
+    :param empty_share: Доля строк с пустым полем, которые должны отбрасываться при чтении
+    :param sorted_dates: Упорядочены ли вакансии по дате публикации, как в настоящей выгрузке
+    :return: Количество записанных строк
+    """
+    rnd = random.Random(seed)
+    first_year, last_year = years
+    years_count = last_year - first_year + 1
+    cities = get_cities(cities_count)
+    city_weights = [1 / rank ** city_skew for rank in range(1, len(cities) + 1)]
+    currencies = currencies or CURRENCIES
+    currency_names = list(currencies.keys())
+    currency_weights = list(currencies.values())
+    with open(file_name, "w", encoding='utf_8_sig', newline='') as csv_file:
+        writer = csv.writer(csv_file, dialect="excel", delimiter=',')
+        writer.writerow(HEADERS)
+        for index in range(rows):
+            if sorted_dates:
+                year = first_year + index * years_count // rows
+            else:
+                year = rnd.randint(first_year, last_year)
+            currency = rnd.choices(currency_names, currency_weights)[0]
+            salary_from = round(rnd.lognormvariate(11, 0.5) * SALARY_SCALE.get(currency, 1), -2)
+            salary_to = salary_from + round(rnd.uniform(0, 0.5) * salary_from, -2)
+            row = [make_name(rnd, html_share), "{:.1f}".format(salary_from), "{:.1f}".format(salary_to), currency,
+                   rnd.choices(cities, city_weights)[0],
+                   "{}-{:02d}-{:02d}T{:02d}:{:02d}:{:02d}+0300".format(
+                       year, rnd.randint(1, 12), rnd.randint(1, 28), rnd.randint(0, 23), rnd.randint(0, 59),
+                       rnd.randint(0, 59))]
+            if rnd.random() < empty_share:
+                row[rnd.randrange(5)] = ""
+            writer.writerow(row)
+    return rows
+
+
+def parse_currencies(value):
+    """ Разбирает доли валют из строки вида RUR=0.9,USD=0.1
+
+    :param value: Строка долей валют
+    :return: Словарь долей валют
+    """
+    currencies = {}
+    for item in value.split(","):
+        currency, share = item.split("=")
+        currencies[currency.strip().upper()] = float(share)
+    return currencies
+
+
+def parse_years(value):
+    """ Разбирает диапазон лет из строки вида 2007-2022
+
+    :param value: Строка диапазона лет
+    :return: Кортеж (первый год, последний год)
+    """
+    first_year, last_year = value.split("-")
+    return int(first_year), int(last_year)
+
+
+def add_arguments(parser):
+    """ Добавляет в парсер аргументы генератора
+
+    :param parser: argparse.ArgumentParser
+    """
+    parser.add_argument("--rows", type=int, default=100000, help="количество вакансий")
+    parser.add_argument("--seed", type=int, default=0, help="зерно генератора")
+    parser.add_argument("--years", type=parse_years, default=(2007, 2022), help="диапазон лет, например 2007-2022")
+    parser.add_argument("--cities", type=int, default=200, help="количество городов")
+    parser.add_argument("--city-skew", type=float, default=1.1, help="показатель Ципфа для городов")
+    parser.add_argument("--currencies", type=parse_currencies, default=None,
+                        help="доли валют, например RUR=0.9,USD=0.1")
+    parser.add_argument("--html-share", type=float, default=0.3, help="доля названий с html разметкой")
+    parser.add_argument("--empty-share", type=float, default=0.02, help="доля строк с пустым полем")
+    parser.add_argument("--unsorted", action="store_true", help="не упорядочивать вакансии по дате")
+
+
+def generate_from_arguments(file_name, arguments):
+    """ Создаёт csv файл вакансий по разобранным аргументам командной строки
+
+    :param file_name: Имя csv файла
+    :param arguments: Результат parse_args с аргументами из add_arguments
+    :return: Количество записанных строк
+    """
+    return generate(file_name, arguments.rows, arguments.seed, arguments.years, arguments.cities,
+                    arguments.city_skew, arguments.currencies, arguments.html_share, arguments.empty_share,
+                    not arguments.unsorted)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Генератор синтетических вакансий")
+    parser.add_argument("file_name", help="имя csv файла")
+    add_arguments(parser)
+    arguments = parser.parse_args()
+    print("Строк: {}".format(generate_from_arguments(arguments.file_name, arguments)))